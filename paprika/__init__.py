@@ -18,12 +18,13 @@ del get_versions, versions
 import logging
 logger = logging.getLogger(__name__)
 
-try:
-    from simtk import openmm
+from paprika.utils import has_openmm
+
+if has_openmm():
     from paprika.setup import Setup
 
     setup = Setup
-except ImportError as e:
+else:
     logging.info("OpenMM not found.")
     logging.info("`paprika.setup()` requires OpenMM.")
     setup = None
@@ -82,11 +82,23 @@ def json_numpy_obj_hook(dct):
     return dct
 
 
+# The atom index attributes set by `DAT_restraint.initialize()`.
+_INDEX_ATTRIBUTES = ("index1", "index2", "index3", "index4")
+
+
 def save_restraints(restraint_list, filepath="restraints.json"):
     log.debug("Saving restraint information as JSON.")
     with open(os.path.join(filepath), "w") as f:
         for restraint in restraint_list:
-            dumped = json.dumps(restraint.__dict__, cls=NumpyEncoder)
+            # Values cached during `initialize()` are not saved.
+            dictionary = {
+                key: value for key, value in restraint.__dict__.items() if key not in DAT_restraint._cached_attributes
+            }
+            # Atom indices are held as int32 arrays, but are saved as plain lists to keep the file readable.
+            for key in _INDEX_ATTRIBUTES:
+                if isinstance(dictionary.get(key), np.ndarray):
+                    dictionary[key] = dictionary[key].tolist()
+            dumped = json.dumps(dictionary, cls=NumpyEncoder)
             f.write(dumped)
             f.write("\n")
 
@@ -109,5 +121,8 @@ def load_restraints(filepath="restraints.json"):
         for class_property in properties:
             if f"_{class_property}" in tmp.__dict__.keys():
                 tmp.__dict__[class_property] = tmp.__dict__[f"_{class_property}"]
+        for key in _INDEX_ATTRIBUTES:
+            if tmp.__dict__.get(key) is not None:
+                tmp.__dict__[key] = np.asarray(tmp.__dict__[key], dtype=np.int32)
         restraints.append(tmp)
     return restraints
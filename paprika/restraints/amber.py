@@ -43,7 +43,7 @@ def amber_restraint_line(restraint, window):
     if restraint.phase[phase]["force_constants"] is None and restraint.phase[phase]["targets"] is None:
         return ""
 
-    if not restraint.index1:
+    if restraint.index1 is None or len(restraint.index1) == 0:
         iat1 = " "
         raise Exception("There must be at least two atoms in a restraint.")
     elif not restraint.group1:
@@ -54,7 +54,7 @@ def amber_restraint_line(restraint, window):
         for index in restraint.index1:
             igr1 += "{},".format(index)
 
-    if not restraint.index2:
+    if restraint.index2 is None or len(restraint.index2) == 0:
         iat2 = " "
         raise Exception("There must be at least two atoms in a restraint.")
     elif not restraint.group2:
@@ -65,7 +65,7 @@ def amber_restraint_line(restraint, window):
         for index in restraint.index2:
             igr2 += "{},".format(index)
 
-    if not restraint.index3:
+    if restraint.index3 is None or len(restraint.index3) == 0:
         iat3 = ""
     elif not restraint.group3:
         iat3 = "{},".format(restraint.index3[0])
@@ -75,7 +75,7 @@ def amber_restraint_line(restraint, window):
         for index in restraint.index3:
             igr3 += "{},".format(index)
 
-    if not restraint.index4:
+    if restraint.index4 is None or len(restraint.index4) == 0:
         iat4 = ""
     elif not restraint.group4:
         iat4 = "{},".format(restraint.index4[0])
@@ -1,4 +1,5 @@
 import logging
+import os
 
 import numpy as np
 import parmed as pmd
@@ -30,7 +31,8 @@ class DAT_restraint(object):
 
     @property
     def topology(self):
-        """The topology file used to initialize the restraints. This is often a PDB file."""
+        """The topology used to initialize the restraints. This can be a path to a file (often a PDB file) or an
+        already loaded :class:`parmed.structure.Structure`."""
         return self._topology
 
     @topology.setter
@@ -218,15 +220,21 @@ class DAT_restraint(object):
 
     instances = []
 
+    # Attributes derived from the restraint inputs during `initialize()`, which are not compared or saved.
+    _cached_attributes = ("_initialize_key",)
+
     def __init__(self):
 
         self._topology = None
+        # The inputs used during the last `initialize()`, so that it can be skipped if nothing has changed.
+        self._initialize_key = None
         self._mask1 = None
         self._mask2 = None
         self._mask3 = None
         self._mask4 = None
 
-        # These indices will be automatically populated during :meth:`paprika.restraints.DAT_restraint.initialize`.
+        # These indices will be automatically populated during :meth:`paprika.restraints.DAT_restraint.initialize`,
+        # as ``numpy.int32`` arrays.
         self.index1 = None
         self.index2 = None
         self.index3 = None
@@ -301,7 +309,12 @@ class DAT_restraint(object):
         logger.debug(other_dictionary)
         keys = set(self_dictionary.keys()) & set(other_dictionary.keys())
         for key in keys:
-            if key != "phase":
+            if key in DAT_restraint._cached_attributes:
+                # Like `topology`, anything derived from it is not compared.
+                continue
+            elif isinstance(self_dictionary[key], np.ndarray) or isinstance(other_dictionary[key], np.ndarray):
+                assert np.array_equal(self_dictionary[key], other_dictionary[key])
+            elif key != "phase":
                 assert self_dictionary[key] == other_dictionary[key]
             else:
                 for phs in ["attach", "pull", "release"]:
@@ -370,18 +383,14 @@ class DAT_restraint(object):
 
         # Attach/Release, Force Constant Method 3
         elif phase in ("a", "r") and method == "3":
-            force_constants = np.asarray(
-                [fraction * restraint_dictionary["fc_final"] for fraction in restraint_dictionary["fraction_list"]]
-            )
+            force_constants = np.asarray(restraint_dictionary["fraction_list"]) * restraint_dictionary["fc_final"]
 
         # Attach/Release, Force Constant Method 4
         elif phase in ("a", "r") and method == "4":
             fractions = np.arange(
                 0, 1.0+restraint_dictionary["fraction_increment"], restraint_dictionary["fraction_increment"]
             )
-            force_constants = np.asarray(
-                [fraction * restraint_dictionary["fc_final"] for fraction in fractions]
-            )
+            force_constants = fractions * restraint_dictionary["fc_final"]
 
         # Attach/Release, Force Constant Method 5
         elif phase in ("a", "r") and method == "5":
@@ -389,7 +398,7 @@ class DAT_restraint(object):
 
         # Attach/Release, Target Method
         if phase in ("a", "r"):
-            targets = np.asarray([restraint_dictionary["target"]] * len(force_constants))
+            targets = np.full(len(force_constants), restraint_dictionary["target"])
 
         # Pull, Target Method 1
         if phase == "p" and method == "1":
@@ -420,21 +429,14 @@ class DAT_restraint(object):
 
         # Pull, Target Method 3
         elif phase == "p" and method == "3":
-            targets = np.asarray(
-                [
-                    fraction * restraint_dictionary["target_final"]
-                    for fraction in restraint_dictionary["fraction_list"]
-                ]
-            )
+            targets = np.asarray(restraint_dictionary["fraction_list"]) * restraint_dictionary["target_final"]
 
         # Pull, Target Method 4
         elif phase == "p" and method == "4":
             fractions = np.arange(
                 0, 1.0+restraint_dictionary["fraction_increment"], restraint_dictionary["fraction_increment"]
             )
-            targets = np.asarray(
-                [fraction * restraint_dictionary["target_final"] for fraction in fractions]
-            )
+            targets = fractions * restraint_dictionary["target_final"]
 
         # Pull, Target Method 5
         elif phase == "p" and method == "5":
@@ -442,7 +444,7 @@ class DAT_restraint(object):
 
         # Pull, Force Constant Method
         if phase == "p":
-            force_constants = np.asarray([restraint_dictionary["fc"]] * len(targets))
+            force_constants = np.full(len(targets), restraint_dictionary["fc"])
 
         if force_constants is None and targets is None:
             logger.error("Unsupported Phase/Method: {} / {}".format(phase, method))
@@ -450,6 +452,37 @@ class DAT_restraint(object):
 
         return force_constants, targets
 
+    def _get_initialize_key(self):
+        """
+        Collect the inputs that :meth:`paprika.restraints.DAT_restraint.initialize` depends on into a tuple that can be
+        compared between calls. Lists and arrays are converted to tuples so the comparison is elementwise, and a
+        topology file is identified by its absolute path and modification time.
+        """
+
+        def freeze(value):
+            if isinstance(value, (list, tuple, np.ndarray)):
+                return tuple(np.asarray(value).tolist())
+            return value
+
+        topology = self.topology
+        if isinstance(topology, str):
+            path = os.path.abspath(topology)
+            topology = (path, os.path.getmtime(path)) if os.path.exists(path) else path
+
+        return (
+            topology,
+            self.mask1,
+            self.mask2,
+            self.mask3,
+            self.mask4,
+            tuple((key, freeze(value)) for key, value in self.attach.items()),
+            tuple((key, freeze(value)) for key, value in self.pull.items()),
+            tuple((key, freeze(value)) for key, value in self.release.items()),
+            self.amber_index,
+            self.continuous_apr,
+            self.auto_apr,
+        )
+
     def initialize(self):
         """
         Automatically set remaining force constants and targets.
@@ -479,10 +512,16 @@ class DAT_restraint(object):
             - Method 4:   fraction_increment, target_final
             - Method 5:   target_list
 
+        If none of these inputs have changed since the last call, this does nothing.
+
         .. note ::
             This is unnecessary overengineering.
         """
 
+        if getattr(self, "_initialize_key", None) is not None and self._get_initialize_key() == self._initialize_key:
+            logger.debug("Restraint inputs are unchanged since the last initialization, skipping...")
+            return
+
         self.phase = {
             "attach": {"force_constants": None, "targets": None},
             "pull": {"force_constants": None, "targets": None},
@@ -713,20 +752,14 @@ class DAT_restraint(object):
 
         # ---------------------------------- ATOM MASKS ---------------------------------- #
         logger.debug("Assigning atom indices...")
-        self.index1 = utils.index_from_mask(self.topology, self.mask1, self.amber_index)
-        self.index2 = utils.index_from_mask(self.topology, self.mask2, self.amber_index)
-        if self.mask3:
-            self.index3 = utils.index_from_mask(
-                self.topology, self.mask3, self.amber_index
-            )
-        else:
-            self.index3 = None
-        if self.mask4:
-            self.index4 = utils.index_from_mask(
-                self.topology, self.mask4, self.amber_index
-            )
-        else:
-            self.index4 = None
+        # A file name is resolved through the structure cache in `utils`, which reparses the file if it has changed.
+        indices = utils.index_from_masks(
+            self.topology, (self.mask1, self.mask2, self.mask3, self.mask4), self.amber_index
+        )
+        # Store the indices compactly as arrays, which can also be used directly in vectorized code.
+        self.index1, self.index2, self.index3, self.index4 = [
+            None if index is None else np.asarray(index, dtype=np.int32) for index in indices
+        ]
         # If any `index` has more than one atom, mark it as a group restraint.
         if self.mask1 and len(self.index1) > 1:
             self.group1 = True
@@ -740,6 +773,9 @@ class DAT_restraint(object):
         if self.mask4 and len(self.index4) > 1:
             self.group4 = True
 
+        # Store the inputs after `auto_apr` has filled in the pull and release values.
+        self._initialize_key = self._get_initialize_key()
+
 
 def static_DAT_restraint(
         restraint_mask_list,
@@ -900,31 +936,10 @@ def check_restraints(restraint_list, create_window_list=False):
                 # release means that `r000` should be skipped and replaced with the
                 # final pull window.
 
-                if phase == "attach" and all_continuous_apr:
-                    window_list += [
-                        phase[0]+str("{:03.0f}".format(val))
-                        for val in np.arange(0, max_count-1, 1)
-                    ]
-                elif phase == "attach" and not all_continuous_apr:
-                    window_list += [
-                        phase[0]+str("{:03.0f}".format(val))
-                        for val in np.arange(0, max_count, 1)
-                    ]
-                elif phase == "pull":
-                    window_list += [
-                        phase[0]+str("{:03.0f}".format(val))
-                        for val in np.arange(0, max_count, 1)
-                    ]
-                elif phase == "release" and all_continuous_apr:
-                    window_list += [
-                        phase[0]+str("{:03.0f}".format(val))
-                        for val in np.arange(1, max_count, 1)
-                    ]
-                elif phase == "release" and not all_continuous_apr:
-                    window_list += [
-                        phase[0]+str("{:03.0f}".format(val))
-                        for val in np.arange(0, max_count, 1)
-                    ]
+                first = 1 if phase == "release" and all_continuous_apr else 0
+                last = max_count - 1 if phase == "attach" and all_continuous_apr else max_count
+                window_numbers = np.char.zfill(np.arange(first, last).astype(str), 3)
+                window_list += np.char.add(phase[0], window_numbers).tolist()
         else:
             logger.error(
                 "Restraints have unequal number of windows during the {} phase.".format(
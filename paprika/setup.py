@@ -720,9 +720,9 @@ def apply_openmm_restraints(system, restraint, window, flat_bottom=False, ForceG
                 / unit.radian ** 2
         )
         flat_bottom_force.addAngle(
-            restraint.index1[0],
-            restraint.index2[0],
-            restraint.index3[0],
+            int(restraint.index1[0]),
+            int(restraint.index2[0]),
+            int(restraint.index3[0]),
             [k, theta_0],
         )
         system.addForce(flat_bottom_force)
@@ -743,8 +743,8 @@ def apply_openmm_restraints(system, restraint, window, flat_bottom=False, ForceG
                 / unit.radian ** 2
         )
         flat_bottom_force.addBond(
-            restraint.index1[0],
-            restraint.index2[0],
+            int(restraint.index1[0]),
+            int(restraint.index2[0]),
             [k, r_0],
         )
         system.addForce(flat_bottom_force)
@@ -770,7 +770,7 @@ def apply_openmm_restraints(system, restraint, window, flat_bottom=False, ForceG
                 * unit.kilocalories_per_mole
                 / unit.angstrom ** 2
             )
-            bond_restraint.addBond(restraint.index1[0], restraint.index2[0], [k, r_0])
+            bond_restraint.addBond(int(restraint.index1[0]), int(restraint.index2[0]), [k, r_0])
             system.addForce(bond_restraint)
         else:
             bond_restraint = openmm.CustomCentroidBondForce(
@@ -784,8 +784,8 @@ def apply_openmm_restraints(system, restraint, window, flat_bottom=False, ForceG
                 * unit.kilocalories_per_mole
                 / unit.angstrom ** 2
             )
-            g1 = bond_restraint.addGroup(restraint.index1)
-            g2 = bond_restraint.addGroup(restraint.index2)
+            g1 = bond_restraint.addGroup([int(index) for index in restraint.index1])
+            g2 = bond_restraint.addGroup([int(index) for index in restraint.index2])
             bond_restraint.addBond([g1, g2], [k, r_0])
             system.addForce(bond_restraint)
 
@@ -805,9 +805,9 @@ def apply_openmm_restraints(system, restraint, window, flat_bottom=False, ForceG
                 / unit.radian ** 2
             )
             angle_restraint.addAngle(
-                restraint.index1[0],
-                restraint.index2[0],
-                restraint.index3[0],
+                int(restraint.index1[0]),
+                int(restraint.index2[0]),
+                int(restraint.index3[0]),
                 [k, theta_0],
             )
             system.addForce(angle_restraint)
@@ -835,10 +835,10 @@ def apply_openmm_restraints(system, restraint, window, flat_bottom=False, ForceG
                 / unit.radian ** 2
             )
             dihedral_restraint.addTorsion(
-                restraint.index1[0],
-                restraint.index2[0],
-                restraint.index3[0],
-                restraint.index4[0],
+                int(restraint.index1[0]),
+                int(restraint.index2[0]),
+                int(restraint.index3[0]),
+                int(restraint.index4[0]),
                 [k, theta_0],
             )
             system.addForce(dihedral_restraint)
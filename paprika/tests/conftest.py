@@ -0,0 +1,24 @@
+"""
+Shared fixtures for the test suite.
+"""
+
+from pathlib import Path
+
+import parmed as pmd
+import pytest
+
+_DATA = Path(__file__).resolve().parent.parent / "data"
+CB6_BUT_PDB = str(_DATA / "cb6-but" / "cb6-but-notcentered.pdb")
+K_CL_PDB = str(_DATA / "k-cl" / "k-cl.pdb")
+
+
+@pytest.fixture(scope="session")
+def cb6_but_notcentered_structure():
+    """ The non-centered CB6-BUT complex, parsed once for the whole test session. """
+    return pmd.load_file(CB6_BUT_PDB, structure=True)
+
+
+@pytest.fixture(scope="session")
+def k_cl_structure():
+    """ The K+/Cl- ion pair, parsed once for the whole test session. """
+    return pmd.load_file(K_CL_PDB, structure=True)
@@ -14,6 +14,33 @@ from paprika import restraints
 log.config_root_logger(verbose=True)
 logger = logging.getLogger(__name__)
 
+ATTACH_FRACTIONS = np.array([0.00, 0.04, 0.181, 0.496, 1.000])
+ATTACH_FRACTIONS.setflags(write=False)
+
+
+def _make_restraint(
+    structure, *, mask1, mask2, mask3=None, mask4=None, attach_target, attach_fc_final, pull_target_final=None,
+    pull_num_windows=19
+):
+    """ Build an attach/pull restraint on the shared attach schedule. By default the pull target is held fixed. """
+    rest = restraints.DAT_restraint()
+    rest.continuous_apr = True
+    rest.amber_index = True
+    rest.topology = structure
+    rest.mask1 = mask1
+    rest.mask2 = mask2
+    rest.mask3 = mask3
+    rest.mask4 = mask4
+    rest.attach["target"] = attach_target
+    rest.attach["fraction_list"] = ATTACH_FRACTIONS
+    rest.attach["fc_final"] = attach_fc_final
+    rest.pull["fc"] = attach_fc_final
+    rest.pull["target_initial"] = attach_target
+    rest.pull["target_final"] = attach_target if pull_target_final is None else pull_target_final
+    rest.pull["num_windows"] = pull_num_windows
+    rest.initialize()
+    return rest
+
 
 @pytest.fixture(scope="module", autouse=True)
 def clean_files(directory="tmp"):
@@ -33,55 +60,25 @@ def setup_free_energy_calculation():
     )
 
     # Distance restraint
-    rest1 = restraints.DAT_restraint()
-    rest1.continuous_apr = True
-    rest1.amber_index = True
-    rest1.topology = input_pdb
-    rest1.mask1 = ":CB6@O"
-    rest1.mask2 = ":BUT@C1"
-    rest1.attach["target"] = 4.5
-    rest1.attach["fraction_list"] = [0.00, 0.04, 0.181, 0.496, 1.000]
-    rest1.attach["fc_final"] = 5.0
-    rest1.pull["fc"] = rest1.attach["fc_final"]
-    rest1.pull["target_initial"] = rest1.attach["target"]
-    rest1.pull["target_final"] = 18.5
-    rest1.pull["num_windows"] = 19
-    rest1.initialize()
+    rest1 = _make_restraint(
+        input_pdb, mask1=":CB6@O", mask2=":BUT@C1", attach_target=4.5, attach_fc_final=5.0, pull_target_final=18.5
+    )
 
     # Angle restraint
-    rest2 = restraints.DAT_restraint()
-    rest2.continuous_apr = True
-    rest2.amber_index = True
-    rest2.topology = input_pdb
-    rest2.mask1 = ":CB6@O1"
-    rest2.mask2 = ":CB6@O"
-    rest2.mask3 = ":BUT@C1"
-    rest2.attach["target"] = 8.0
-    rest2.attach["fraction_list"] = [0.00, 0.04, 0.181, 0.496, 1.000]
-    rest2.attach["fc_final"] = 50.0
-    rest2.pull["fc"] = rest2.attach["fc_final"]
-    rest2.pull["target_initial"] = rest2.attach["target"]
-    rest2.pull["target_final"] = rest2.attach["target"]
-    rest2.pull["num_windows"] = 19
-    rest2.initialize()
+    rest2 = _make_restraint(
+        input_pdb, mask1=":CB6@O1", mask2=":CB6@O", mask3=":BUT@C1", attach_target=8.0, attach_fc_final=50.0
+    )
 
     # Dihedral restraint
-    rest3 = restraints.DAT_restraint()
-    rest3.continuous_apr = True
-    rest3.amber_index = True
-    rest3.topology = input_pdb
-    rest3.mask1 = ":CB6@O11"
-    rest3.mask2 = ":CB6@O1"
-    rest3.mask3 = ":CB6@O"
-    rest3.mask4 = ":BUT@C1"
-    rest3.attach["target"] = -60.0
-    rest3.attach["fraction_list"] = [0.00, 0.04, 0.181, 0.496, 1.000]
-    rest3.attach["fc_final"] = 50.0
-    rest3.pull["fc"] = rest3.attach["fc_final"]
-    rest3.pull["target_initial"] = rest3.attach["target"]
-    rest3.pull["target_final"] = rest3.attach["target"]
-    rest3.pull["num_windows"] = 19
-    rest3.initialize()
+    rest3 = _make_restraint(
+        input_pdb,
+        mask1=":CB6@O11",
+        mask2=":CB6@O1",
+        mask3=":CB6@O",
+        mask4=":BUT@C1",
+        attach_target=-60.0,
+        attach_fc_final=50.0,
+    )
 
     # Create window directories
     restraints.restraints.create_window_list([rest1, rest2, rest3])
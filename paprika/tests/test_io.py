@@ -8,6 +8,8 @@ import pytest
 
 from paprika.io import *
 
+CB6_BUT_PDB = os.path.join(os.path.dirname(__file__), "../data/cb6-but/cb6-but-notcentered.pdb")
+
 
 @pytest.fixture(scope="function", autouse=True)
 def clean_files(directory="tmp"):
@@ -26,7 +28,7 @@ def test_save_and_load_single_restraint(clean_files):
     rest.amber_index = True
     rest.continuous_apr = False
     rest.auto_apr = False
-    rest.topology = os.path.join(os.path.dirname(__file__), "../data/cb6-but/cb6-but-notcentered.pdb")
+    rest.topology = CB6_BUT_PDB
     rest.mask1 = ":CB6@O,O2,O4,O6,O8,O10"
     rest.mask2 = ":BUT@C3"
     rest.attach["target"] = 3.0
@@ -45,6 +47,12 @@ def test_save_and_load_single_restraint(clean_files):
     save_restraints([rest], os.path.join("tmp", "rest.json"))
     restraints = load_restraints(os.path.join("tmp", "rest.json"))
     assert rest == restraints[0]
+    assert restraints[0].index1.dtype == np.int32
+
+    # The indices are written as readable lists of integers.
+    with open(os.path.join("tmp", "rest.json"), "r") as f:
+        saved = json.loads(f.readline())
+    assert saved["index1"] == rest.index1.tolist()
 
 
 def test_save_and_load_list_restraint(clean_files):
@@ -53,7 +61,7 @@ def test_save_and_load_list_restraint(clean_files):
     rest1.amber_index = True
     rest1.continuous_apr = False
     rest1.auto_apr = False
-    rest1.topology = os.path.join(os.path.dirname(__file__), "../data/cb6-but/cb6-but-notcentered.pdb")
+    rest1.topology = CB6_BUT_PDB
     rest1.mask1 = ":CB6@O,O2,O4,O6,O8,O10"
     rest1.mask2 = ":BUT@C3"
     rest1.attach["target"] = 3.0
@@ -74,7 +82,7 @@ def test_save_and_load_list_restraint(clean_files):
     rest2.amber_index = True
     rest2.continuous_apr = False
     rest2.auto_apr = False
-    rest2.topology = os.path.join(os.path.dirname(__file__), "../data/cb6-but/cb6-but-notcentered.pdb")
+    rest2.topology = CB6_BUT_PDB
     rest2.mask1 = ":CB6@O,O2,O4,O6,O8,O10"
     rest2.mask2 = ":BUT@C3"
     rest2.mask3 = ":BUT@C"
@@ -2,22 +2,25 @@
 Tests the restraints utilities.
 """
 
-import pytest
 import os
 
+import parmed as pmd
+import pytest
+
+from paprika import utils
+from paprika.restraints.amber import amber_restraint_line
 from paprika.restraints.restraints import *
 
 logger = logging.getLogger(__name__)
 
 
-def test_DAT_restraint():
-    # Method 1
+def _method_1(topology):
     logger.info("### Testing restraint 1, Method 1")
     rest1 = DAT_restraint()
     rest1.amber_index = True
     rest1.continuous_apr = False
     rest1.auto_apr = False
-    rest1.topology = os.path.join(os.path.dirname(__file__), "../data/cb6-but/cb6-but-notcentered.pdb")
+    rest1.topology = topology
     rest1.mask1 = ":CB6@O,O2,O4,O6,O8,O10"
     rest1.mask2 = ":BUT@C3"
     rest1.attach["target"] = 3.0
@@ -33,47 +36,16 @@ def test_DAT_restraint():
     rest1.release["fc_initial"] = rest1.attach["fc_initial"]
     rest1.release["fc_final"] = rest1.attach["fc_final"]
     rest1.initialize()
-    assert rest1.index1 == [13, 31, 49, 67, 85, 103]
-    assert rest1.index2 == [119]
-    assert rest1.index3 == None
-    assert rest1.index4 == None
-    assert np.allclose(
-        rest1.phase["attach"]["force_constants"], np.array([0.0, 1.0, 2.0, 3.0])
-    )
-    assert np.allclose(rest1.phase["attach"]["targets"], np.array([3.0, 3.0, 3.0, 3.0]))
-    assert np.allclose(
-        rest1.phase["pull"]["force_constants"], np.array([3.0, 3.0, 3.0, 3.0])
-    )
-    assert np.allclose(rest1.phase["pull"]["targets"], np.array([3.0, 4.0, 5.0, 6.0]))
-    assert np.allclose(
-        rest1.phase["release"]["force_constants"], np.array([0.0, 1.0, 2.0, 3.0])
-    )
-    assert np.allclose(
-        rest1.phase["release"]["targets"], np.array([6.0, 6.0, 6.0, 6.0])
-    )
-    window_list = create_window_list([rest1])
-    assert window_list == [
-        "a000",
-        "a001",
-        "a002",
-        "a003",
-        "p000",
-        "p001",
-        "p002",
-        "p003",
-        "r000",
-        "r001",
-        "r002",
-        "r003",
-    ]
-
-    # Method 1a
+    return rest1
+
+
+def _method_1a(topology):
     logger.info("### Testing restraint 2, Method 1a")
     rest2 = DAT_restraint()
     rest2.amber_index = True
     rest2.continuous_apr = False
     rest2.auto_apr = False
-    rest2.topology = os.path.join(os.path.dirname(__file__), "../data/cb6-but/cb6-but-notcentered.pdb")
+    rest2.topology = topology
     rest2.mask1 = ":CB6@O,O2,O4,O6,O8,O10"
     rest2.mask2 = ":BUT@C3"
     rest2.mask3 = ":BUT@C"
@@ -87,51 +59,17 @@ def test_DAT_restraint():
     rest2.release["num_windows"] = rest2.attach["num_windows"]
     rest2.release["fc_final"] = rest2.attach["fc_final"]
     rest2.initialize()
-    assert rest2.index1 == [13, 31, 49, 67, 85, 103]
-    assert rest2.index2 == [119]
-    assert rest2.index3 == [109]
-    assert rest2.index4 == None
-    assert np.allclose(
-        rest2.phase["attach"]["force_constants"], np.array([0.0, 25.0, 50.0, 75.0])
-    )
-    assert np.allclose(
-        rest2.phase["attach"]["targets"], np.array([180.0, 180.0, 180.0, 180.0])
-    )
-    assert np.allclose(
-        rest2.phase["pull"]["force_constants"], np.array([75.0, 75.0, 75.0, 75.0])
-    )
-    assert np.allclose(
-        rest2.phase["pull"]["targets"], np.array([0.0, 60.0, 120.0, 180.0])
-    )
-    assert np.allclose(
-        rest2.phase["release"]["force_constants"], np.array([0.0, 25.0, 50.0, 75.0])
-    )
-    assert np.allclose(
-        rest2.phase["release"]["targets"], np.array([180.0, 180.0, 180.0, 180.0])
-    )
-    window_list = create_window_list([rest2])
-    assert window_list == [
-        "a000",
-        "a001",
-        "a002",
-        "a003",
-        "p000",
-        "p001",
-        "p002",
-        "p003",
-        "r000",
-        "r001",
-        "r002",
-        "r003",
-    ]
-
-    # Method 2 (Note auto_apr = True)
+    return rest2
+
+
+def _method_2(topology):
+    # Note auto_apr = True
     logger.info("### Testing restraint 3, Method 2")
     rest3 = DAT_restraint()
     rest3.amber_index = True
     rest3.continuous_apr = False
     rest3.auto_apr = True
-    rest3.topology = os.path.join(os.path.dirname(__file__), "../data/cb6-but/cb6-but-notcentered.pdb")
+    rest3.topology = topology
     rest3.mask1 = ":CB6@O2"
     rest3.mask2 = ":CB6@O"
     rest3.mask3 = ":BUT@C3"
@@ -144,51 +82,16 @@ def test_DAT_restraint():
     rest3.pull["target_final"] = 93.0
     rest3.release["fc_final"] = 75.0
     rest3.initialize()
-    assert rest3.index1 == [31]
-    assert rest3.index2 == [13]
-    assert rest3.index3 == [119]
-    assert rest3.index4 == [109]
-    assert np.allclose(
-        rest3.phase["attach"]["force_constants"], np.array([0.0, 25.0, 50.0, 75.0])
-    )
-    assert np.allclose(
-        rest3.phase["attach"]["targets"], np.array([90.0, 90.0, 90.0, 90.0])
-    )
-    assert np.allclose(
-        rest3.phase["pull"]["force_constants"], np.array([75.0, 75.0, 75.0, 75.0])
-    )
-    assert np.allclose(
-        rest3.phase["pull"]["targets"], np.array([90.0, 91.0, 92.0, 93.0])
-    )
-    assert np.allclose(
-        rest3.phase["release"]["force_constants"], np.array([0.0, 25.0, 50.0, 75.0])
-    )
-    assert np.allclose(
-        rest3.phase["release"]["targets"], np.array([93.0, 93.0, 93.0, 93.0])
-    )
-    window_list = create_window_list([rest3])
-    assert window_list == [
-        "a000",
-        "a001",
-        "a002",
-        "a003",
-        "p000",
-        "p001",
-        "p002",
-        "p003",
-        "r000",
-        "r001",
-        "r002",
-        "r003",
-    ]
-
-    # Method 2a
+    return rest3
+
+
+def _method_2a(topology):
     logger.info("### Testing restraint 4, Method 2a")
     rest4 = DAT_restraint()
     rest4.amber_index = True
     rest4.continuous_apr = False
     rest4.auto_apr = False
-    rest4.topology = os.path.join(os.path.dirname(__file__), "../data/cb6-but/cb6-but-notcentered.pdb")
+    rest4.topology = topology
     rest4.mask1 = ":CB6@O2"
     rest4.mask2 = ":CB6@O"
     rest4.mask3 = ":BUT@C3"
@@ -203,47 +106,16 @@ def test_DAT_restraint():
     rest4.release["fc_increment"] = 25.0
     rest4.release["fc_final"] = 75.0
     rest4.initialize()
-    assert rest4.index1 == [31]
-    assert rest4.index2 == [13]
-    assert rest4.index3 == [119]
-    assert rest4.index4 == [109]
-    assert np.allclose(
-        rest4.phase["attach"]["force_constants"], np.array([0.0, 25.0, 50.0, 75.0])
-    )
-    assert np.allclose(rest4.phase["attach"]["targets"], np.array([0.0, 0.0, 0.0, 0.0]))
-    assert np.allclose(
-        rest4.phase["pull"]["force_constants"], np.array([75.0, 75.0, 75.0, 75.0])
-    )
-    assert np.allclose(rest4.phase["pull"]["targets"], np.array([0.0, 1.0, 2.0, 3.0]))
-    assert np.allclose(
-        rest4.phase["release"]["force_constants"], np.array([0.0, 25.0, 50.0, 75.0])
-    )
-    assert np.allclose(
-        rest4.phase["release"]["targets"], np.array([3.0, 3.0, 3.0, 3.0])
-    )
-    window_list = create_window_list([rest4])
-    assert window_list == [
-        "a000",
-        "a001",
-        "a002",
-        "a003",
-        "p000",
-        "p001",
-        "p002",
-        "p003",
-        "r000",
-        "r001",
-        "r002",
-        "r003",
-    ]
-
-    # Method 3
+    return rest4
+
+
+def _method_3(topology):
     logger.info("### Testing restraint 5, Method 3")
     rest5 = DAT_restraint()
     rest5.amber_index = True
     rest5.continuous_apr = False
     rest5.auto_apr = False
-    rest5.topology = os.path.join(os.path.dirname(__file__), "../data/cb6-but/cb6-but-notcentered.pdb")
+    rest5.topology = topology
     rest5.mask1 = ":CB6@O,O2,O4,O6,O8,O10"
     rest5.mask2 = ":BUT@C*"
     rest5.attach["target"] = 0.0
@@ -256,46 +128,16 @@ def test_DAT_restraint():
     rest5.release["fraction_list"] = [0.0, 0.3, 0.6, 1.0]
     rest5.release["fc_final"] = rest5.attach["fc_final"]
     rest5.initialize()
-    assert rest5.index1 == [13, 31, 49, 67, 85, 103]
-    assert rest5.index2 == [109, 113, 115, 119]
-    assert rest5.index3 == None
-    assert rest5.index4 == None
-    assert np.allclose(
-        rest5.phase["attach"]["force_constants"], np.array([0.0, 1.0, 2.5, 5.0])
-    )
-    assert np.allclose(rest5.phase["attach"]["targets"], np.array([0.0, 0.0, 0.0, 0.0]))
-    assert np.allclose(
-        rest5.phase["pull"]["force_constants"], np.array([5.0, 5.0, 5.0])
-    )
-    assert np.allclose(rest5.phase["pull"]["targets"], np.array([0.0, 0.5, 1.0]))
-    assert np.allclose(
-        rest5.phase["release"]["force_constants"], np.array([0.0, 1.5, 3.0, 5.0])
-    )
-    assert np.allclose(
-        rest5.phase["release"]["targets"], np.array([1.0, 1.0, 1.0, 1.0])
-    )
-    window_list = create_window_list([rest5])
-    assert window_list == [
-        "a000",
-        "a001",
-        "a002",
-        "a003",
-        "p000",
-        "p001",
-        "p002",
-        "r000",
-        "r001",
-        "r002",
-        "r003",
-    ]
-
-    # Method 4
+    return rest5
+
+
+def _method_4(topology):
     logger.info("### Testing restraint 6, Method 4")
     rest6 = DAT_restraint()
     rest6.amber_index = True
     rest6.continuous_apr = False
     rest6.auto_apr = False
-    rest6.topology = os.path.join(os.path.dirname(__file__), "../data/cb6-but/cb6-but-notcentered.pdb")
+    rest6.topology = topology
     rest6.mask1 = ":CB6@O,O2,O4,O6,O8,O10"
     rest6.mask2 = ":BUT@C*"
     rest6.attach["target"] = 0.0
@@ -308,51 +150,17 @@ def test_DAT_restraint():
     rest6.release["fraction_increment"] = 0.33
     rest6.release["fc_final"] = rest6.attach["fc_final"]
     rest6.initialize()
-    assert rest6.index1 == [13, 31, 49, 67, 85, 103]
-    assert rest6.index2 == [109, 113, 115, 119]
-    assert rest6.index3 == None
-    assert rest6.index4 == None
-    assert np.allclose(
-        rest6.phase["attach"]["force_constants"], np.array([0.0, 1.25, 2.5, 3.75, 5.0])
-    )
-    assert np.allclose(
-        rest6.phase["attach"]["targets"], np.array([0.0, 0.0, 0.0, 0.0, 0.0])
-    )
-    assert np.allclose(
-        rest6.phase["pull"]["force_constants"], np.array([5.0, 5.0, 5.0])
-    )
-    assert np.allclose(rest6.phase["pull"]["targets"], np.array([0.0, 0.5, 1.0]))
-    ### Note, the 6.6 in the following test is wrong ... needs to get fixed.
-    assert np.allclose(
-        rest6.phase["release"]["force_constants"], np.array([0.0, 1.65, 3.3, 4.95, 6.6])
-    )
-    assert np.allclose(
-        rest6.phase["release"]["targets"], np.array([1.0, 1.0, 1.0, 1.0, 1.0])
-    )
-    window_list = create_window_list([rest6])
-    assert window_list == [
-        "a000",
-        "a001",
-        "a002",
-        "a003",
-        "a004",
-        "p000",
-        "p001",
-        "p002",
-        "r000",
-        "r001",
-        "r002",
-        "r003",
-        "r004",
-    ]
-
-    # Method 5 (Note continuous_apr = True)
+    return rest6
+
+
+def _method_5(topology):
+    # Note continuous_apr = True
     logger.info("### Testing restraint 7, Method 5")
     rest7 = DAT_restraint()
     rest7.amber_index = True
     rest7.continuous_apr = True
     rest7.auto_apr = False
-    rest7.topology = os.path.join(os.path.dirname(__file__), "../data/cb6-but/cb6-but-notcentered.pdb")
+    rest7.topology = topology
     rest7.mask1 = ":1@O,O1,:BUT@H1"
     rest7.mask2 = ":CB6@N"
     rest7.attach["target"] = 0.0
@@ -362,45 +170,16 @@ def test_DAT_restraint():
     rest7.release["target"] = 1.5
     rest7.release["fc_list"] = [0.0, 0.66, 1.2, 2.0]
     rest7.initialize()
-    assert rest7.index1 == [13, 14, 111]
-    assert rest7.index2 == [3]
-    assert rest7.index3 == None
-    assert rest7.index4 == None
-    assert np.allclose(
-        rest7.phase["attach"]["force_constants"], np.array([0.0, 0.5, 1.0, 2.0])
-    )
-    assert np.allclose(rest7.phase["attach"]["targets"], np.array([0.0, 0.0, 0.0, 0.0]))
-    assert np.allclose(
-        rest7.phase["pull"]["force_constants"], np.array([2.0, 2.0, 2.0, 2.0])
-    )
-    assert np.allclose(rest7.phase["pull"]["targets"], np.array([0.0, 0.5, 1.0, 1.5]))
-    assert np.allclose(
-        rest7.phase["release"]["force_constants"], np.array([0.0, 0.66, 1.2, 2.0])
-    )
-    assert np.allclose(
-        rest7.phase["release"]["targets"], np.array([1.5, 1.5, 1.5, 1.5])
-    )
-    window_list = create_window_list([rest7])
-    assert window_list == [
-        "a000",
-        "a001",
-        "a002",
-        "p000",
-        "p001",
-        "p002",
-        "p003",
-        "r001",
-        "r002",
-        "r003",
-    ]
-
-    # Just Attach
+    return rest7
+
+
+def _just_attach(topology):
     logger.info("### Testing restraint 8, just attach")
     rest8 = DAT_restraint()
     rest8.amber_index = True
     rest8.continuous_apr = False
     rest8.auto_apr = False
-    rest8.topology = os.path.join(os.path.dirname(__file__), "../data/cb6-but/cb6-but-notcentered.pdb")
+    rest8.topology = topology
     rest8.mask1 = ":CB6@O"
     rest8.mask2 = ":BUT@C3"
     rest8.attach["target"] = 0.0
@@ -408,28 +187,16 @@ def test_DAT_restraint():
     rest8.attach["fc_initial"] = 0.0
     rest8.attach["fc_final"] = 3.0
     rest8.initialize()
-    assert rest8.index1 == [13]
-    assert rest8.index2 == [119]
-    assert rest8.index3 == None
-    assert rest8.index4 == None
-    assert np.allclose(
-        rest8.phase["attach"]["force_constants"], np.array([0.0, 1.0, 2.0, 3.0])
-    )
-    assert np.allclose(rest8.phase["attach"]["targets"], np.array([0.0, 0.0, 0.0, 0.0]))
-    assert rest8.phase["pull"]["force_constants"] == None
-    assert rest8.phase["pull"]["targets"] == None
-    assert rest8.phase["release"]["force_constants"] == None
-    assert rest8.phase["release"]["targets"] == None
-    window_list = create_window_list([rest8])
-    assert window_list == ["a000", "a001", "a002", "a003"]
-
-    # Just Pull
+    return rest8
+
+
+def _just_pull(topology):
     logger.info("### Testing restraint 9, just pull")
     rest9 = DAT_restraint()
     rest9.amber_index = True
     rest9.continuous_apr = False
     rest9.auto_apr = False
-    rest9.topology = os.path.join(os.path.dirname(__file__), "../data/cb6-but/cb6-but-notcentered.pdb")
+    rest9.topology = topology
     rest9.mask1 = ":CB6@O"
     rest9.mask2 = ":BUT@C3"
     rest9.pull["fc"] = 3.0
@@ -437,28 +204,16 @@ def test_DAT_restraint():
     rest9.pull["target_initial"] = 0.0
     rest9.pull["target_final"] = 3.0
     rest9.initialize()
-    assert rest9.index1 == [13]
-    assert rest9.index2 == [119]
-    assert rest9.index3 == None
-    assert rest9.index4 == None
-    assert rest9.phase["attach"]["force_constants"] == None
-    assert rest9.phase["attach"]["targets"] == None
-    assert np.allclose(
-        rest9.phase["pull"]["force_constants"], np.array([3.0, 3.0, 3.0, 3.0])
-    )
-    assert np.allclose(rest9.phase["pull"]["targets"], np.array([0.0, 1.0, 2.0, 3.0]))
-    assert rest9.phase["release"]["force_constants"] == None
-    assert rest9.phase["release"]["targets"] == None
-    window_list = create_window_list([rest9])
-    assert window_list == ["p000", "p001", "p002", "p003"]
-
-    # Just Release
+    return rest9
+
+
+def _just_release(topology):
     logger.info("### Testing restraint 10, just release")
     rest10 = DAT_restraint()
     rest10.amber_index = True
     rest10.continuous_apr = False
     rest10.auto_apr = False
-    rest10.topology = os.path.join(os.path.dirname(__file__), "../data/cb6-but/cb6-but-notcentered.pdb")
+    rest10.topology = topology
     rest10.mask1 = ":CB6@O"
     rest10.mask2 = ":BUT@C3"
     rest10.release["target"] = 0.0
@@ -466,25 +221,229 @@ def test_DAT_restraint():
     rest10.release["fc_initial"] = 0.0
     rest10.release["fc_final"] = 2.0
     rest10.initialize()
-    assert rest10.index1 == [13]
-    assert rest10.index2 == [119]
-    assert rest10.index3 == None
-    assert rest10.index4 == None
-    assert rest10.phase["attach"]["force_constants"] == None
-    assert rest10.phase["attach"]["targets"] == None
-    assert rest10.phase["pull"]["force_constants"] == None
-    assert rest10.phase["pull"]["targets"] == None
-    assert np.allclose(
-        rest10.phase["release"]["force_constants"], np.array([0.0, 1.0, 2.0])
-    )
-    assert np.allclose(rest10.phase["release"]["targets"], np.array([0.0, 0.0, 0.0]))
-    window_list = create_window_list([rest10])
-    assert window_list == ["r000", "r001", "r002"]
+    return rest10
+
+
+# Each case is a restraint builder and the expected atom indices, (force constants, targets) for each phase, and
+# window list. A phase of `None` means the restraint is not active during that phase.
+CASES = [
+    (
+        _method_1,
+        {
+            "indices": ([13, 31, 49, 67, 85, 103], [119], None, None),
+            "attach": ([0.0, 1.0, 2.0, 3.0], [3.0, 3.0, 3.0, 3.0]),
+            "pull": ([3.0, 3.0, 3.0, 3.0], [3.0, 4.0, 5.0, 6.0]),
+            "release": ([0.0, 1.0, 2.0, 3.0], [6.0, 6.0, 6.0, 6.0]),
+            "window_list": [
+                "a000", "a001", "a002", "a003",
+                "p000", "p001", "p002", "p003",
+                "r000", "r001", "r002", "r003",
+            ],
+        },
+    ),
+    (
+        _method_1a,
+        {
+            "indices": ([13, 31, 49, 67, 85, 103], [119], [109], None),
+            "attach": ([0.0, 25.0, 50.0, 75.0], [180.0, 180.0, 180.0, 180.0]),
+            "pull": ([75.0, 75.0, 75.0, 75.0], [0.0, 60.0, 120.0, 180.0]),
+            "release": ([0.0, 25.0, 50.0, 75.0], [180.0, 180.0, 180.0, 180.0]),
+            "window_list": [
+                "a000", "a001", "a002", "a003",
+                "p000", "p001", "p002", "p003",
+                "r000", "r001", "r002", "r003",
+            ],
+        },
+    ),
+    (
+        _method_2,
+        {
+            "indices": ([31], [13], [119], [109]),
+            "attach": ([0.0, 25.0, 50.0, 75.0], [90.0, 90.0, 90.0, 90.0]),
+            "pull": ([75.0, 75.0, 75.0, 75.0], [90.0, 91.0, 92.0, 93.0]),
+            "release": ([0.0, 25.0, 50.0, 75.0], [93.0, 93.0, 93.0, 93.0]),
+            "window_list": [
+                "a000", "a001", "a002", "a003",
+                "p000", "p001", "p002", "p003",
+                "r000", "r001", "r002", "r003",
+            ],
+        },
+    ),
+    (
+        _method_2a,
+        {
+            "indices": ([31], [13], [119], [109]),
+            "attach": ([0.0, 25.0, 50.0, 75.0], [0.0, 0.0, 0.0, 0.0]),
+            "pull": ([75.0, 75.0, 75.0, 75.0], [0.0, 1.0, 2.0, 3.0]),
+            "release": ([0.0, 25.0, 50.0, 75.0], [3.0, 3.0, 3.0, 3.0]),
+            "window_list": [
+                "a000", "a001", "a002", "a003",
+                "p000", "p001", "p002", "p003",
+                "r000", "r001", "r002", "r003",
+            ],
+        },
+    ),
+    (
+        _method_3,
+        {
+            "indices": ([13, 31, 49, 67, 85, 103], [109, 113, 115, 119], None, None),
+            "attach": ([0.0, 1.0, 2.5, 5.0], [0.0, 0.0, 0.0, 0.0]),
+            "pull": ([5.0, 5.0, 5.0], [0.0, 0.5, 1.0]),
+            "release": ([0.0, 1.5, 3.0, 5.0], [1.0, 1.0, 1.0, 1.0]),
+            "window_list": [
+                "a000", "a001", "a002", "a003",
+                "p000", "p001", "p002",
+                "r000", "r001", "r002", "r003",
+            ],
+        },
+    ),
+    (
+        _method_4,
+        {
+            "indices": ([13, 31, 49, 67, 85, 103], [109, 113, 115, 119], None, None),
+            "attach": ([0.0, 1.25, 2.5, 3.75, 5.0], [0.0, 0.0, 0.0, 0.0, 0.0]),
+            "pull": ([5.0, 5.0, 5.0], [0.0, 0.5, 1.0]),
+            ### Note, the 6.6 in the following test is wrong ... needs to get fixed.
+            "release": ([0.0, 1.65, 3.3, 4.95, 6.6], [1.0, 1.0, 1.0, 1.0, 1.0]),
+            "window_list": [
+                "a000", "a001", "a002", "a003", "a004",
+                "p000", "p001", "p002",
+                "r000", "r001", "r002", "r003", "r004",
+            ],
+        },
+    ),
+    (
+        _method_5,
+        {
+            "indices": ([13, 14, 111], [3], None, None),
+            "attach": ([0.0, 0.5, 1.0, 2.0], [0.0, 0.0, 0.0, 0.0]),
+            "pull": ([2.0, 2.0, 2.0, 2.0], [0.0, 0.5, 1.0, 1.5]),
+            "release": ([0.0, 0.66, 1.2, 2.0], [1.5, 1.5, 1.5, 1.5]),
+            "window_list": [
+                "a000", "a001", "a002",
+                "p000", "p001", "p002", "p003",
+                "r001", "r002", "r003",
+            ],
+        },
+    ),
+    (
+        _just_attach,
+        {
+            "indices": ([13], [119], None, None),
+            "attach": ([0.0, 1.0, 2.0, 3.0], [0.0, 0.0, 0.0, 0.0]),
+            "pull": None,
+            "release": None,
+            "window_list": ["a000", "a001", "a002", "a003"],
+        },
+    ),
+    (
+        _just_pull,
+        {
+            "indices": ([13], [119], None, None),
+            "attach": None,
+            "pull": ([3.0, 3.0, 3.0, 3.0], [0.0, 1.0, 2.0, 3.0]),
+            "release": None,
+            "window_list": ["p000", "p001", "p002", "p003"],
+        },
+    ),
+    (
+        _just_release,
+        {
+            "indices": ([13], [119], None, None),
+            "attach": None,
+            "pull": None,
+            "release": ([0.0, 1.0, 2.0], [0.0, 0.0, 0.0]),
+            "window_list": ["r000", "r001", "r002"],
+        },
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    "builder, expected", CASES, ids=[builder.__name__.lstrip("_") for builder, _ in CASES]
+)
+def test_DAT_restraint(builder, expected, cb6_but_notcentered_structure):
+    rest = builder(cb6_but_notcentered_structure)
+    for index, expected_index in zip([rest.index1, rest.index2, rest.index3, rest.index4], expected["indices"]):
+        if expected_index is None:
+            assert index is None
+        else:
+            assert index.dtype == np.int32
+            assert index.tolist() == expected_index
+    for phase in ["attach", "pull", "release"]:
+        if expected[phase] is None:
+            assert rest.phase[phase]["force_constants"] == None
+            assert rest.phase[phase]["targets"] == None
+        else:
+            force_constants, targets = expected[phase]
+            assert list(rest.phase[phase]["force_constants"]) == pytest.approx(force_constants)
+            assert list(rest.phase[phase]["targets"]) == pytest.approx(targets)
+    window_list = create_window_list([rest])
+    assert window_list == expected["window_list"]
+
+
+def test_DAT_restraint_consistency(cb6_but_notcentered_structure):
+    topology = cb6_but_notcentered_structure
 
     # Test inconsistent continuous_apr:
     with pytest.raises(Exception) as e_info:
-        window_list = create_window_list([rest7, rest8])
+        window_list = create_window_list([_method_5(topology), _just_attach(topology)])
 
     # Test inconsistent windows:
     with pytest.raises(Exception) as e_info:
-        window_list = create_window_list([rest1, rest10])
\ No newline at end of file
+        window_list = create_window_list([_method_1(topology), _just_release(topology)])
+
+
+@pytest.mark.parametrize("file_name", ["vac.prmtop", "vac.pdb"])
+def test_DAT_restraint_topology_file(file_name):
+    """ Test that a restraint resolves its masks from a topology given as a file name, for more than one format. """
+    topology = os.path.join(os.path.dirname(__file__), "../data/cb6-but-apr", file_name)
+    rest = DAT_restraint()
+    rest.amber_index = True
+    rest.topology = topology
+    rest.mask1 = ":CB6@O"
+    rest.mask2 = ":BUT@C1"
+    rest.attach["target"] = 3.0
+    rest.attach["num_windows"] = 2
+    rest.attach["fc_final"] = 5.0
+    rest.initialize()
+
+    structure = pmd.load_file(topology, structure=True)
+    assert list(rest.index1) == [i + 1 for i in pmd.amber.mask.AmberMask(structure, ":CB6@O").Selected()]
+    assert list(rest.index2) == [i + 1 for i in pmd.amber.mask.AmberMask(structure, ":BUT@C1").Selected()]
+    # Loading the prmtop for the masks must not have dropped the bonds it defines.
+    if file_name.endswith(".prmtop"):
+        assert len(utils.return_parmed_structure(topology).bonds) == len(structure.bonds) > 0
+
+
+# Partial custom_restraint_values that turn the harmonic restraint into a flat-bottom or one-sided wall restraint.
+# Any value that is not overridden keeps the harmonic default for the window.
+WALL_CASES = [
+    pytest.param({"r2": 4.0, "r3": 5.0}, id="flat_bottom"),
+    pytest.param({"rk2": 0.0, "r3": 6.0}, id="upper_wall"),
+    pytest.param({"rk3": 0.0, "r2": 3.0}, id="lower_wall"),
+    pytest.param({}, id="harmonic"),
+]
+
+
+@pytest.mark.parametrize("overrides", WALL_CASES)
+def test_amber_restraint_line_walls(overrides, k_cl_structure):
+    """ Test that custom restraint values override only the matching harmonic restraint values in every window. """
+    rest = DAT_restraint()
+    rest.amber_index = True
+    rest.continuous_apr = True
+    rest.topology = k_cl_structure
+    rest.mask1 = ":K+"
+    rest.mask2 = ":Cl-"
+    rest.attach["target"] = 4.5
+    rest.attach["num_windows"] = 2
+    rest.attach["fc_final"] = 5.0
+    rest.custom_restraint_values.update(overrides)
+    rest.initialize()
+
+    for window, force_constant in zip(["a000", "a001"], [0.0, 5.0]):
+        expected = {"r1": 0.0, "r2": 4.5, "r3": 4.5, "r4": 999.0, "rk2": force_constant, "rk3": force_constant}
+        expected.update(overrides)
+        line = amber_restraint_line(rest, window)
+        for key, value in expected.items():
+            assert " {}= {:10.5f},".format(key, value) in line
@@ -2,155 +2,328 @@
 Tests tleap tools.
 """
 
-import random as random
+import contextlib
+import copy
+import hashlib
+import inspect
+import json
+import logging as log
+import mmap
+import os
+import re
 import shutil
+import tempfile
+import warnings
+from collections import Counter
+from functools import lru_cache
+from itertools import islice
 
+import numpy as np
 import pytest
 
-from paprika.align import *
-from paprika.dummy import *
-from paprika.tleap import *
+import paprika.tleap
+from paprika.align import zalign
+from paprika.dummy import add_dummy, write_dummy_frcmod, write_dummy_mol2
+from paprika.tleap import ANGSTROM_CUBED_TO_LITERS, System
 
+AVOGADRO = 6.0221409e23
+# Set PAPRIKA_TEST_SEED to reproduce a particular set of random test inputs.
+RNG = np.random.default_rng(int(os.environ.get("PAPRIKA_TEST_SEED", "0")))
+CB6_BUT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../data/cb6-but"))
 
-@pytest.fixture
-def clean_files(directory=os.path.join(os.path.dirname(__file__), "tmp")):
-    # This happens before the test function call
-    if os.path.isdir(directory):
-        shutil.rmtree(directory)
-    os.makedirs(directory)
-    yield
-    # This happens after the test function call
-    shutil.rmtree(directory)
+
+@lru_cache(maxsize=None)
+def _solvate_template():
+    """
+    Return the lines of `tleap_solvate.in`, with its data paths made absolute so it can be built in any directory.
+
+    The file is only read once; callers get a tuple, so the cached lines cannot be changed by accident, and make a
+    list from it for `template_lines`.
+    """
+    with open(os.path.join(CB6_BUT, "tleap_solvate.in"), "r") as f:
+        return tuple(
+            line.replace("../paprika/data/cb6-but", CB6_BUT)
+            for line in f.read().splitlines()
+        )
+
+
+# The `System` settings that determine the output of a build, and those a build sets that the tests read afterwards.
+_BUILD_INPUTS = (
+    "loadpdb_file",
+    "pbc_type",
+    "buffer_value",
+    "target_waters",
+    "water_box",
+    "neutralize",
+    "counter_cation",
+    "counter_anion",
+    "add_ions",
+    "output_prefix",
+)
+_BUILD_RESULTS = ("buffer_value", "target_waters", "add_ion_residues", "waters_to_remove")
+
+
+def _build(sys):
+    """
+    Build `sys`. If the `PAPRIKA_TEST_CACHE` environment variable names a directory, the output files of each build
+    are stored there under a hash of its inputs (settings, template, the contents of every file the template loads,
+    the source of `paprika.tleap`, and the `tleap` executable), and copied back instead of running `tleap` when the same inputs come up again.
+    """
+    cache_root = os.environ.get("PAPRIKA_TEST_CACHE")
+    if not cache_root:
+        sys.build()
+        return
+
+    if sys.template_file:
+        with open(sys.template_file, "r") as f:
+            lines = f.read().splitlines()
+    else:
+        lines = list(sys.template_lines)
+    digest = hashlib.sha256(
+        repr([(name, getattr(sys, name)) for name in _BUILD_INPUTS]).encode()
+    )
+    # A change to the code under test, or a different AmberTools install, must not be served an old build.
+    digest.update(inspect.getsource(paprika.tleap).encode())
+    tleap = shutil.which("tleap")
+    if tleap:
+        tleap = os.path.realpath(tleap)
+        stat = os.stat(tleap)
+        digest.update(repr((tleap, stat.st_size, stat.st_mtime)).encode())
+    paths = [sys.loadpdb_file] if sys.loadpdb_file else []
+    for line in lines:
+        digest.update(line.encode() + b"\n")
+        paths.extend(line.split())
+    for path in paths:
+        path = os.path.join(sys.output_path, path)
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    cache_dir = os.path.join(cache_root, digest.hexdigest())
+    outputs = [sys.output_prefix + extension for extension in (".prmtop", ".rst7", ".pdb")]
+
+    if os.path.isdir(cache_dir):
+        for name in outputs:
+            shutil.copy(os.path.join(cache_dir, name), sys.output_path)
+        with open(os.path.join(cache_dir, "results.json"), "r") as f:
+            for name, value in json.load(f).items():
+                setattr(sys, name, value)
+        # Leave the System as build() would, so it can still run `tleap` itself.
+        sys.template_file = None
+        sys.template_lines = lines
+        sys.filter_template()
+        return
+
+    sys.build()
+    # Fill a scratch directory and rename it into place, so parallel test runs never see a partial entry.
+    os.makedirs(cache_root, exist_ok=True)
+    scratch = tempfile.mkdtemp(dir=cache_root)
+    for name in outputs:
+        shutil.copy(os.path.join(sys.output_path, name), scratch)
+    with open(os.path.join(scratch, "results.json"), "w") as f:
+        json.dump({name: getattr(sys, name) for name in _BUILD_RESULTS}, f)
+    try:
+        os.rename(scratch, cache_dir)
+    except OSError:
+        # Another run stored the same build first.
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+@pytest.fixture(scope="module")
+def solvated(tmp_path_factory):
+    """
+    Solvate CB6-BUT once for each combination of settings used in this module.
+
+    Yields a function that takes `System` attributes as keyword arguments and returns the built `System`. Tests that
+    ask for the same settings share one build.
+    """
+    systems = {}
+
+    def build(**settings):
+        key = repr(sorted(settings.items()))
+        if key not in systems:
+            sys = System()
+            sys.template_lines = list(_solvate_template())
+            sys.output_path = str(tmp_path_factory.mktemp("solvate"))
+            sys.loadpdb_file = os.path.join(CB6_BUT, "cb6-but.pdb")
+            sys.output_prefix = "solvate"
+            for name, value in settings.items():
+                setattr(sys, name, value)
+            _build(sys)
+            systems[key] = sys
+        return systems[key]
+
+    yield build
+
+    for sys in systems.values():
+        shutil.rmtree(sys.output_path, ignore_errors=True)
+
+
+# Whole-token patterns for the labels counted across a prmtop, so that e.g. "K" does not match "K+".
+_TOKEN_RES = {
+    token: re.compile(rb"(?<![\w+-])" + re.escape(token.encode()) + rb"(?![\w+-])")
+    for token in ("WAT", "K+")
+}
+
+
+@contextlib.contextmanager
+def _mmap_prmtop(path):
+    """
+    Memory-map a file read-only, so it can be searched without reading it into memory.
+    """
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as contents:
+            yield contents
+
+
+def _count(path, token):
+    """
+    Count the occurrences of `token` as a whole label in a file.
+    """
+    with _mmap_prmtop(path) as contents:
+        return len(_TOKEN_RES[token].findall(contents))
+
+
+def _residue_counts(path):
+    """
+    Count the residue names in the `RESIDUE_LABEL` section of a prmtop.
+    """
+    with _mmap_prmtop(path) as contents:
+        start = contents.find(b"%FLAG RESIDUE_LABEL")
+        end = contents.find(b"%FLAG", start + 1)
+        section = contents[start : end if end != -1 else len(contents)]
+    counts = Counter()
+    # Skip the %FLAG and %FORMAT(20a4) lines
+    for line in section.decode().splitlines()[2:]:
+        counts.update(line[i : i + 4].strip() for i in range(0, len(line), 4))
+    return counts
 
 
 @pytest.mark.slow
-def test_solvation_simple(clean_files):
+@pytest.mark.parametrize("waters", [1500, 5000, 9000])
+def test_solvation_simple(waters, tmp_path):
     """ Test that we can solvate CB6-BUT using default settings. """
-    waters = np.random.randint(100, 10000)
     log.debug("Trying {} waters with default settings...".format(waters))
     sys = System()
-    sys.template_file = os.path.join(
-        os.path.dirname(__file__), "../data/cb6-but/tleap_solvate.in"
-    )
-    sys.output_path = "tmp"
+    sys.template_lines = list(_solvate_template())
+    sys.output_path = str(tmp_path)
     sys.target_waters = waters
     sys.output_prefix = "solvate"
-    sys.build()
-    grepped_waters = sp.check_output(
-        ["grep -oh 'WAT' ./tmp/solvate.prmtop | wc -w"], shell=True
-    )
-    assert int(grepped_waters) == waters
+    _build(sys)
+    assert _count(tmp_path / "solvate.prmtop", "WAT") == waters
 
 
 @pytest.mark.parametrize("shape", ["octahedral", "cubic"])
-def test_solvation_shapes(shape, clean_files):
+def test_solvation_shapes(shape, tmp_path):
     """ Test that we can solvate CB6-BUT with a truncated octahedron. """
-    waters = np.random.randint(1000, 10000)
+    waters = 2000
     log.debug("Trying {} waters in a truncated octahedron...".format(waters))
     sys = System()
-    sys.template_file = os.path.join(
-        os.path.dirname(__file__), "../data/cb6-but/tleap_solvate.in"
-    )
-    sys.output_path = "tmp"
-    sys.loadpdb_file = os.path.join(
-        os.path.dirname(__file__), "../data/cb6-but/cb6-but.pdb"
-    )
+    sys.template_lines = list(_solvate_template())
+    sys.output_path = str(tmp_path)
+    sys.loadpdb_file = os.path.join(CB6_BUT, "cb6-but.pdb")
     sys.target_waters = waters
     sys.output_prefix = "solvate"
     sys.pbc_type = shape
+    _build(sys)
+    assert _count(tmp_path / "solvate.prmtop", "WAT") == waters
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("add_ions", [None, ["NA", "0.150M", "CL", "0.150M"]], ids=["no_ions", "molar_ions"])
+def test_solvation_probe_workers(add_ions, tmp_path):
+    """ Test that probing several buffer values at once still reaches the target, with a log for each probe. """
+    waters = 2000
+    sys = System()
+    # Molar ions are recounted as the volume changes during the search, which must not discard the probes' output.
+    sys.add_ions = add_ions
+    sys.template_lines = list(_solvate_template())
+    sys.output_path = str(tmp_path)
+    sys.loadpdb_file = os.path.join(CB6_BUT, "cb6-but.pdb")
+    sys.target_waters = waters
+    sys.probe_workers = 4
+    sys.output_prefix = "solvate"
+    # Always run `tleap` here, since the probe logs are part of what is checked.
     sys.build()
-    grepped_waters = sp.check_output(
-        ["grep -oh 'WAT' ./tmp/solvate.prmtop | wc -w"], shell=True
-    )
-    assert int(grepped_waters) == waters
+    assert _count(tmp_path / "solvate.prmtop", "WAT") == waters
+    for index in range(4):
+        assert (tmp_path / "solvate.probe{}.log".format(index)).is_file()
+
+
+@pytest.mark.parametrize(
+    "buffers, waters, target, expected",
+    [
+        pytest.param([1.0, 2.0], [100, 400], 1000, 4.0, id="expand"),
+        pytest.param([4.0, 8.0], [2000, 5000], 1000, 2.0, id="shrink"),
+        pytest.param([2.0, 4.0], [400, 2200], 1000, 2.0 + 600 * 2.0 / 1800, id="interpolate"),
+        pytest.param([2.0, 4.0], [400, 1010], 1000, 3.0, id="bisect"),
+        pytest.param([1.0, 2.0, 3.0, 4.0], [100, 800, 2700, 6400], 1000, 10 ** (1.0 / 3.0), id="cubic_fit"),
+        pytest.param([1.0, 2.0, 2.0, 3.0], [100, 800, 810, 2700], 1200, 2.0 + 390 / 1890, id="repeated_buffer"),
+    ],
+)
+def test_adjust_buffer_value(buffers, waters, target, expected):
+    """ Test each branch of the buffer value search, without running `tleap`. """
+    sys = System()
+    sys.probe_workers = 1
+    sys.target_waters = target
+    sys.buffer_val_history = [0] + buffers
+    sys.wat_added_history = [0] + waters
+    # An underdetermined cubic fit would warn; make that fail the test.
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        sys.adjust_buffer_value()
+    assert sys.buffer_value == pytest.approx(expected)
+    # The search only chooses the next buffer value; the history records what was actually run.
+    assert sys.buffer_val_history == [0] + buffers
+    assert sys.wat_added_history == [0] + waters
 
 
 @pytest.mark.slow
-def test_solvation_spatial_size(clean_files):
+def test_solvation_spatial_size(tmp_path):
     """ Test that we can solvate CB6-BUT with an buffer size in Angstroms. """
-    random_int = np.random.randint(10, 20)
-    random_size = random_int * np.random.random_sample(1) + random_int
-    log.debug("Trying buffer size of {} A...".format(random_size[0]))
+    random_int = int(RNG.integers(10, 20))
+    random_size = random_int * RNG.random() + random_int
+    log.debug("Trying buffer size of {} A...".format(random_size))
     sys = System()
-    sys.template_file = os.path.join(
-        os.path.dirname(__file__), "../data/cb6-but/tleap_solvate.in"
-    )
-    sys.output_path = "tmp"
-    sys.loadpdb_file = os.path.join(
-        os.path.dirname(__file__), "../data/cb6-but/cb6-but.pdb"
-    )
-    sys.buffer_value = float(random_size[0])
+    sys.template_lines = list(_solvate_template())
+    sys.output_path = str(tmp_path)
+    sys.loadpdb_file = os.path.join(CB6_BUT, "cb6-but.pdb")
+    sys.buffer_value = float(random_size)
     sys.output_prefix = "solvate"
     sys.pbc_type = "cubic"
-    sys.build()
-    grepped_waters = sp.check_output(
-        ["grep -oh 'WAT' ./tmp/solvate.prmtop | wc -w"], shell=True
-    )
-    assert int(grepped_waters) == sys.target_waters
+    _build(sys)
+    assert _count(tmp_path / "solvate.prmtop", "WAT") == sys.target_waters
 
 
 @pytest.mark.slow
-def test_solvation_potassium_control(clean_files):
+def test_solvation_potassium_control(solvated):
     """ Test there is no potassium by default. A negative control. """
-    waters = np.random.randint(1000, 10000)
-    log.debug("Trying {} waters with potassium...".format(waters))
-    sys = System()
-    sys.template_file = os.path.join(
-        os.path.dirname(__file__), "../data/cb6-but/tleap_solvate.in"
-    )
-    sys.output_path = "tmp"
-    sys.loadpdb_file = os.path.join(
-        os.path.dirname(__file__), "../data/cb6-but/cb6-but.pdb"
-    )
-    sys.target_waters = waters
-    sys.output_prefix = "solvate"
-    sys.counter_cation = "K+"
-    sys.build()
-    potassium = sp.check_output(
-        ["grep -oh 'K+' ./tmp/solvate.prmtop | wc -w"], shell=True
-    )
-    assert int(potassium) == 0
+    # The number of waters doesn't matter here.
+    sys = solvated(target_waters=2000, counter_cation="K+")
+    assert _count(os.path.join(sys.output_path, "solvate.prmtop"), "K+") == 0
 
 
 @pytest.mark.slow
-def test_solvation_with_additional_ions(clean_files):
+def test_solvation_with_additional_ions(solvated):
     """ Test that we can solvate CB6-BUT with additional ions. """
-    waters = np.random.randint(1000, 10000)
+    waters = 2000
     cations = ["LI", "Na+", "K+", "RB", "CS"]
     anions = ["F", "Cl-", "BR", "IOD"]
-    n_cations = np.random.randint(1, 10)
-    n_anions = np.random.randint(1, 10)
-    random_cation = random.choice(cations)
-    random_anion = random.choice(anions)
+    # One draw for both ion counts and both ion choices. `System.add_ions` needs Python ints for ion counts.
+    n_cations, n_anions, cation_index, anion_index = RNG.integers(
+        [1, 1, 0, 0], [10, 10, len(cations), len(anions)]
+    ).tolist()
+    random_cation = cations[cation_index]
+    random_anion = anions[anion_index]
     log.debug("Trying {} waters with additional ions...".format(waters))
-    sys = System()
-    sys.template_file = os.path.join(
-        os.path.dirname(__file__), "../data/cb6-but/tleap_solvate.in"
-    )
-    sys.output_path = "tmp"
-    sys.loadpdb_file = os.path.join(
-        os.path.dirname(__file__), "../data/cb6-but/cb6-but.pdb"
+    sys = solvated(
+        target_waters=waters,
+        neutralize=False,
+        add_ions=[random_cation, n_cations, random_anion, n_anions],
     )
-    sys.target_waters = waters
-    sys.output_prefix = "solvate"
-    sys.neutralize = False
-    sys.add_ions = [random_cation, n_cations, random_anion, n_anions]
-    sys.build()
     # These should come in the RESIDUE_LABEL region of the prmtop and be before all the water.
-    cation_number = sp.check_output(
-        [
-            "grep -A 99 RESIDUE_LABEL ./tmp/solvate.prmtop | "
-            + "grep -oh '{} ' | wc -w".format(random_cation)
-        ],
-        shell=True,
-    )
-    anion_number = sp.check_output(
-        [
-            "grep -A 99 RESIDUE_LABEL ./tmp/solvate.prmtop | "
-            + "grep -oh '{} ' | wc -w".format(random_anion)
-        ],
-        shell=True,
-    )
+    counts = _residue_counts(os.path.join(sys.output_path, "solvate.prmtop"))
+    cation_number = counts[random_cation]
+    anion_number = counts[random_anion]
     log.debug("Expecting...")
     log.debug("cation = {}\tn_cations={}".format(random_cation, n_cations))
     log.debug("anion  = {}\t n_anions={}".format(random_anion, n_anions))
@@ -158,95 +331,86 @@ def test_solvation_with_additional_ions(clean_files):
     log.debug("             n_cations={}".format(cation_number))
     log.debug("              n_anions={}".format(anion_number))
 
-    assert int(cation_number) == n_cations and int(anion_number) == n_anions
+    assert cation_number == n_cations and anion_number == n_anions
 
 
-def test_solvation_by_M_and_m(clean_files):
+def test_solvation_by_M_and_m(solvated):
     """ Test that we can solvate CB6-BUT through molarity and molality. """
     log.debug("Trying 10 A buffer with 150 mM NaCl...")
-    sys = System()
-    sys.template_file = os.path.join(
-        os.path.dirname(__file__), "../data/cb6-but/tleap_solvate.in"
-    )
-    sys.output_path = "tmp"
-    sys.loadpdb_file = os.path.join(
-        os.path.dirname(__file__), "../data/cb6-but/cb6-but.pdb"
+    sys = solvated(
+        buffer_value=10.0,
+        neutralize=False,
+        pbc_type="rectangular",
+        add_ions=["NA", "0.150M", "CL", "0.150M", "K", "0.100m", "BR", "0.100m"],
     )
-    sys.buffer_value = 10.0
-    sys.output_prefix = "solvate"
-    sys.neutralize = False
-    sys.pbc_type = "rectangular"
-    sys.add_ions = ["NA", "0.150M", "CL", "0.150M", "K", "0.100m", "BR", "0.100m"]
-    sys.build()
+    counts = _residue_counts(os.path.join(sys.output_path, "solvate.prmtop"))
 
-    # Molarity Check
-    obs_num_na = sp.check_output(
-        ["grep -A 99 RESIDUE_LABEL ./tmp/solvate.prmtop | " + "grep -oh 'NA ' | wc -w"],
-        shell=True,
-    )
-    obs_num_cl = sp.check_output(
-        ["grep -A 99 RESIDUE_LABEL ./tmp/solvate.prmtop | " + "grep -oh 'CL ' | wc -w"],
-        shell=True,
+    # Molarity (NA, CL) and molality (K, BR) checks. Without save lines, the volume and residue counts both come
+    # from the cached output of the final build run rather than two more `tleap` runs.
+    sys.write_save_lines = False
+    volume_in_liters = sys.get_volume() * ANGSTROM_CUBED_TO_LITERS
+    calc_num_waters = sys.count_residues()["WAT"]
+    concentrations = np.array([0.150, 0.150, 0.100, 0.100])
+    factors = np.array(
+        [
+            AVOGADRO * volume_in_liters,
+            AVOGADRO * volume_in_liters,
+            0.018 * calc_num_waters,
+            0.018 * calc_num_waters,
+        ]
     )
+    calc_num_na, calc_num_cl, calc_num_k, calc_num_br = np.ceil(
+        concentrations * factors
+    ).astype(int)
+    assert counts["NA"] == calc_num_na
+    assert counts["CL"] == calc_num_cl
+    assert counts["K"] == calc_num_k
+    assert counts["BR"] == calc_num_br
 
-    volume = sys.get_volume()
-    volume_in_liters = volume * ANGSTROM_CUBED_TO_LITERS
-    calc_num_na = np.ceil((6.022 * 10 ** 23) * (0.150) * volume_in_liters)
-    calc_num_cl = np.ceil((6.022 * 10 ** 23) * (0.150) * volume_in_liters)
-    assert int(obs_num_na) == int(calc_num_na)
-    assert int(obs_num_cl) == int(calc_num_cl)
-
-    # Molality Check
-    obs_num_k = sp.check_output(
-        ["grep -A 99 RESIDUE_LABEL ./tmp/solvate.prmtop | " + "grep -oh 'K ' | wc -w"],
-        shell=True,
-    )
-    obs_num_br = sp.check_output(
-        ["grep -A 99 RESIDUE_LABEL ./tmp/solvate.prmtop | " + "grep -oh 'BR ' | wc -w"],
-        shell=True,
+
+@pytest.mark.parametrize("shape", ["cubic", "rectangular"])
+def test_solvation_target_waters_by_M(shape, solvated):
+    """ Test that molar ion counts match the volume of the final box when solvating to a number of waters. """
+    waters = 2000
+    sys = solvated(
+        target_waters=waters,
+        neutralize=False,
+        pbc_type=shape,
+        add_ions=["NA", "0.150M", "CL", "0.150M"],
     )
-    calc_num_waters = sys.count_residues()["WAT"]
-    calc_num_k = np.ceil(0.100 * calc_num_waters * 0.018)
-    calc_num_br = np.ceil(0.100 * calc_num_waters * 0.018)
-    assert int(obs_num_k) == int(calc_num_k)
-    assert int(obs_num_br) == int(calc_num_br)
+    counts = _residue_counts(os.path.join(sys.output_path, "solvate.prmtop"))
+    assert counts["WAT"] == waters
+
+    # The volume at the final buffer value, not one extrapolated during the search.
+    sys.write_save_lines = False
+    volume_in_liters = sys.get_volume() * ANGSTROM_CUBED_TO_LITERS
+    expected = int(np.ceil(0.150 * AVOGADRO * volume_in_liters))
+    assert counts["NA"] == expected
+    assert counts["CL"] == expected
 
 
 @pytest.mark.slow
-def test_alignment_workflow(clean_files):
+def test_alignment_workflow(tmp_path, cb6_but_notcentered_structure):
     """ Test that we can solvate CB6-BUT after alignment. """
-    cb6 = pmd.load_file(
-        os.path.join(
-            os.path.dirname(__file__), "../data/cb6-but/cb6-but-notcentered.pdb"
-        )
-    )
-    zalign(cb6, ":CB6", ":BUT", save=True, filename="./tmp/tmp.pdb")
-    waters = np.random.randint(1000, 10000)
+    cb6 = copy.copy(cb6_but_notcentered_structure)
+    zalign(cb6, ":CB6", ":BUT", save=True, filename=str(tmp_path / "tmp.pdb"))
+    waters = 2000
     sys = System()
-    sys.template_file = os.path.join(
-        os.path.dirname(__file__), "../data/cb6-but/tleap_solvate.in"
-    )
-    sys.output_path = "tmp"
+    sys.template_lines = list(_solvate_template())
+    sys.output_path = str(tmp_path)
     sys.loadpdb_file = "tmp.pdb"
     sys.target_waters = waters
     sys.output_prefix = "solvate"
-    sys.build()
+    _build(sys)
     log.debug("Trying {} waters after alignment...".format(waters))
-    grepped_waters = sp.check_output(
-        ["grep -oh 'WAT' ./tmp/solvate.prmtop | wc -w"], shell=True
-    )
-    assert int(grepped_waters) == waters
+    assert _count(tmp_path / "solvate.prmtop", "WAT") == waters
 
 
-def test_add_dummy(clean_files):
+def test_add_dummy(tmp_path, cb6_but_notcentered_structure):
     """ Test that dummy atoms get added correctly """
-    temporary_directory = os.path.join(os.path.dirname(__file__), "tmp")
-    host_guest = pmd.load_file(
-        os.path.join(
-            os.path.dirname(__file__), "../data/cb6-but/cb6-but-notcentered.pdb"
-        ),
-        structure=True,
-    )
+    temporary_directory = str(tmp_path)
+    # Work on a copy, since the parsed structure is shared by the whole session.
+    host_guest = copy.copy(cb6_but_notcentered_structure)
     host_guest = zalign(host_guest, ":BUT@C", ":BUT@C3", save=False)
     host_guest = add_dummy(host_guest, residue_name="DM1", z=-11.000, y=2.000, x=-1.500)
 
@@ -254,9 +418,7 @@ def test_add_dummy(clean_files):
         os.path.join(temporary_directory, "cb6-but-dum.pdb"), renumber=False
     )
     with open(os.path.join(temporary_directory, "cb6-but-dum.pdb"), "r") as f:
-        lines = f.readlines()
-        test_line1 = lines[123].rstrip()
-        test_line2 = lines[124].rstrip()
+        test_line1, test_line2 = [line.rstrip() for line in islice(f, 123, 125)]
     ref_line1 = "TER     123      BUT     2"
     ref_line2 = (
         "HETATM  123 DUM  DM1     3      -1.500   2.000 -11.000  0.00  0.00          PB"
@@ -294,15 +456,13 @@ def test_add_dummy(clean_files):
     sys.output_prefix = "cb6-but-dum"
     sys.pbc_type = None
     sys.neutralize = False
-    sys.build()
-    with open(
-            os.path.join(os.path.dirname(__file__), "../data/cb6-but/REF_cb6-but-dum.rst7"),
-            "r",
-    ) as f:
-        contents = f.read()
-        reference = [float(i) for i in contents.split()[2:]]
-
-    with open(os.path.join(temporary_directory, "cb6-but-dum.rst7"), "r") as f:
-        contents = f.read()
-        new = [float(i) for i in contents.split()[2:]]
-    assert np.allclose(reference, new)
+    _build(sys)
+    with open(os.path.join(CB6_BUT, "REF_cb6-but-dum.rst7"), "rb") as f:
+        reference = f.read()
+    with open(os.path.join(temporary_directory, "cb6-but-dum.rst7"), "rb") as f:
+        new = f.read()
+    # Identical files need no parsing; otherwise compare the numbers after the title and atom count.
+    if new != reference:
+        reference = np.array(reference.split()[2:], dtype=float)
+        new = np.array(new.split()[2:], dtype=float)
+        assert np.allclose(reference, new)
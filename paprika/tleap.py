@@ -1,12 +1,64 @@
+import copy
+import io
 import os as os
 import re as re
+import shutil
 import subprocess as sp
 import logging as log
+import math
+import mmap
 import numpy as np
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# Residue and water lines from the `desc` dump, e.g. "R<WAT 1234>".
+_R_RE = re.compile(r"^R<(\S+) ", re.MULTILINE)
+_WAT_RE = re.compile(r"^R<WAT (.*?)>", re.MULTILINE)
+_VOLUME_RE = re.compile(r"Volume(.*)")
+_LEAP_LOG_PROBLEM_RE = re.compile(
+    rb"ERROR|WARNING|Warning|duplicate|FATAL|Could|Fatal|Error"
+)
+
+# Template lines that filter_template() rewrites or, when solvating, removes.
+_LOADPDB_RE = re.compile(r"loadpdb")
+_FILTER_RE = re.compile(
+    r"^\s*(addions|addions2|addionsrand|desc|quit|solvate|save)", re.IGNORECASE
+)
 
 
 N_A = 6.0221409 * 10 ** 23
 ANGSTROM_CUBED_TO_LITERS = 1 * 10 ** -27
+# Number of ions per cubic angstrom for each mol/L of concentration.
+MOLAR_TO_COUNT_PER_A3 = N_A * ANGSTROM_CUBED_TO_LITERS
+
+
+def _parse_output(output):
+    """
+    Parse the residue counts, water residue numbers, and volume from `tleap` output.
+
+    Parameters
+    ----------
+    output : list
+        The tleap stdout as a list of lines
+
+    Returns
+    -------
+    parsed : dict
+        The residue counts under "residues", the list of water residues under "waters", and the volume in cubic
+        angstroms (or None) under "volume"
+
+    """
+    text = "\n".join(output)
+    parsed = {
+        "residues": dict(Counter(_R_RE.findall(text))),
+        "waters": _WAT_RE.findall(text),
+        "volume": None,
+    }
+    # The total simulation volume, if `tleap` reported one.
+    match = _VOLUME_RE.search(text)
+    if match:
+        parsed["volume"] = float(match.group(1).rstrip()[1:-4])
+    return parsed
 
 
 class System(object):
@@ -57,16 +109,12 @@ class System(object):
         Append a prefix to files created by this module. Default: 'build'
     unit : str
         The tleap unit name. Default: 'model'
-    exponent : int
-        The initial value used for dynamically adjusting the buffer value. Default: 1
-    min_exponent_limit : int
-        The minimum limit that we let exponent get to. If it gets too small, it has no effect on
-        the number of waters added. Default: -5
-    cyc_since_last_exp_change : int
-        A count of the number of buffer_value adjustments since the last exponent change. Should
-        always start at 0. Default: 0
     max_cycles : int
         The maximum number of buffer_value adjustment cycles.  Default: 50
+    probe_workers : int
+        When target_waters is set, this many buffer values (doubling from the starting value) are tried at once
+        before the search begins, to bracket the target quickly. Each concurrent run writes its own
+        `<output_prefix>.probe<N>.log` in output_path. Default: 1 (disabled)
     manual_switch_thresh : int
         The threshold difference between waters actually added and target_waters for which we can
         safely switch to manual removal of waters. If too large, then there will be big air pockets
@@ -91,6 +139,9 @@ class System(object):
 
     """
 
+    # Full path to the `tleap` executable, resolved on first use.
+    _TLEAP_BIN = None
+
     def __init__(self):
 
         # User Settings: Defaults
@@ -110,10 +161,8 @@ class System(object):
 
         # Advanced Settings: Defaults
         self.unit = "model"
-        self.exponent = 1
-        self.min_exponent_limit = -5
-        self.cyc_since_last_exp_change = 0
         self.max_cycles = 50
+        self.probe_workers = 1
         self.manual_switch_thresh = None
         self.waters_to_remove = None
         self.add_ion_residues = None
@@ -122,6 +171,29 @@ class System(object):
         self.wat_added_history = [0]
         self.write_save_lines = True
 
+        # Parsed `tleap` output from search runs, keyed by the settings that produced it.
+        self._run_cache = {}
+        # (buffer_value, volume) pairs measured by `tleap`, used to estimate the volume at other buffer values.
+        self._volume_samples = []
+        # (buffer_value, waters) pairs counted by concurrent probes. They inform adjust_buffer_value(), but are kept out
+        # of buffer_val_history and wat_added_history, which only record the buffer values the search actually ran.
+        self._probe_samples = []
+
+    @property
+    def template_lines(self):
+        """
+        The list of `tleap` commands used to build the system.
+
+        Replace the list rather than editing it in place: the joined input text is prepared when it is set.
+        """
+        return self._template_lines
+
+    @template_lines.setter
+    def template_lines(self, value):
+        self._template_lines = value
+        # The template does not change between solvation cycles, so it is joined once here instead of on every run.
+        self._template_input = None if value is None else "".join(line + "\n" for line in value)
+
     def build(self):
         """
         Build the tleap.System
@@ -137,8 +209,7 @@ class System(object):
             with open(self.template_file, "r") as f:
                 self.template_lines = f.read().splitlines()
         elif self.template_lines:
-            for i, line in enumerate(self.template_lines):
-                self.template_lines[i] = line.rstrip()
+            self.template_lines = [line.rstrip() for line in self.template_lines]
         else:
             raise Exception(
                 "Either template_file or template_lines needs to be specified"
@@ -150,7 +221,7 @@ class System(object):
         # Either just write/run tleap, or do solvate
         if self.pbc_type is None:
             self.write_input()
-            self.run()
+            self.run(capture_output=False)
         else:
             self.solvate()
 
@@ -163,7 +234,7 @@ class System(object):
         filtered_lines = []
         for line in self.template_lines:
             # Find loadpdb line, replace pdb file if necessary, set unit name
-            if re.search("loadpdb", line):
+            if _LOADPDB_RE.search(line):
                 words = line.rstrip().replace("=", " ").split()
                 if self.loadpdb_file is None:
                     self.loadpdb_file = words[2]
@@ -174,11 +245,7 @@ class System(object):
             # Remove any included solvation and ionization commands if pbc_type
             # is not None
             elif self.pbc_type is not None:
-                if not re.search(
-                    r"^\s*(addions|addions2|addionsrand|desc|quit|solvate|save)",
-                    line,
-                    re.IGNORECASE,
-                ):
+                if not _FILTER_RE.search(line):
                     filtered_lines.append(line)
             else:
                 filtered_lines.append(line)
@@ -199,71 +266,89 @@ class System(object):
                 raise
 
         with open(file_path, "w") as f:
-            for line in self.template_lines:
-                f.write(line + "\n")
+            self._write_commands(f)
 
-            if self.pbc_type == "cubic":
-                f.write(
-                    "solvatebox {} {} {} iso\n".format(
-                        self.unit, self.water_box, self.buffer_value
-                    )
+    def _write_commands(self, f):
+        """
+        Write the `tleap` commands for the current settings to an open file-like object.
+
+        Parameters
+        ----------
+        f : file-like
+            Anything with a `write` method, such as an open file or `io.StringIO`
+
+        """
+        lines = []
+
+        if self.pbc_type == "cubic":
+            lines.append(
+                "solvatebox {} {} {} iso".format(
+                    self.unit, self.water_box, self.buffer_value
                 )
-            elif self.pbc_type == "rectangular":
-                f.write(
-                    "solvatebox {} {} {{10.0 10.0 {}}}\n".format(
-                        self.unit, self.water_box, self.buffer_value
-                    )
+            )
+        elif self.pbc_type == "rectangular":
+            lines.append(
+                "solvatebox {} {} {{10.0 10.0 {}}}".format(
+                    self.unit, self.water_box, self.buffer_value
                 )
-            elif self.pbc_type == "octahedral":
-                f.write(
-                    "solvateoct {} {} {} iso\n".format(
-                        self.unit, self.water_box, self.buffer_value
-                    )
+            )
+        elif self.pbc_type == "octahedral":
+            lines.append(
+                "solvateoct {} {} {} iso".format(
+                    self.unit, self.water_box, self.buffer_value
                 )
-            elif self.pbc_type is None:
-                f.write("# Skipping solvation ...\n")
-            else:
-                raise Exception(
-                    "Incorrect pbctype value provided: "
-                    + str(self.pbc_type)
-                    + ". Only `cubic`, `rectangular`, `octahedral`, and None are valid"
+            )
+        elif self.pbc_type is None:
+            lines.append("# Skipping solvation ...")
+        else:
+            raise Exception(
+                "Incorrect pbctype value provided: "
+                + str(self.pbc_type)
+                + ". Only `cubic`, `rectangular`, `octahedral`, and None are valid"
+            )
+        if self.neutralize:
+            lines.append("addionsrand {} {} 0".format(self.unit, self.counter_cation))
+            lines.append("addionsrand {} {} 0".format(self.unit, self.counter_anion))
+        # Additional ions should be specified as a list, with residue name and number of ions in pairs, like ['NA',
+        # 5] for five additional sodium ions. By this point, if the user specified a molality or molarity,
+        # it should already have been converted into a number.
+        if self.add_ion_residues:
+            pairs = iter(self.add_ion_residues)
+            for residue, amount in zip(pairs, pairs):
+                lines.append("addionsrand {} {} {}".format(self.unit, residue, amount))
+        if self.waters_to_remove:
+            for water_number in self.waters_to_remove:
+                lines.append(
+                    "remove {} {}.{}".format(self.unit, self.unit, water_number)
                 )
-            if self.neutralize:
-                f.write("addionsrand {} {} 0\n".format(self.unit, self.counter_cation))
-                f.write("addionsrand {} {} 0\n".format(self.unit, self.counter_anion))
-            # Additional ions should be specified as a list, with residue name and number of ions in pairs, like ['NA',
-            # 5] for five additional sodium ions. By this point, if the user specified a molality or molarity,
-            # it should already have been converted into a number.
-            if self.add_ion_residues:
-                for residue, amount in zip(
-                    self.add_ion_residues[0::2], self.add_ion_residues[1::2]
-                ):
-                    f.write("addionsrand {} {} {}\n".format(self.unit, residue, amount))
-            if self.waters_to_remove:
-                for water_number in self.waters_to_remove:
-                    f.write(
-                        "remove {} {}.{}\n".format(self.unit, self.unit, water_number)
-                    )
 
-            # Note, the execution of tleap is assumed to take place in the
-            # same directory as all the associated input files, so we won't
-            # put directory paths on the saveamberparm or savepdb commands.
-            if self.output_prefix and self.write_save_lines:
-                f.write("savepdb {} {}.pdb\n".format(self.unit, self.output_prefix))
-                f.write(
-                    "saveamberparm {} {}.prmtop {}.rst7\n".format(
-                        self.unit, self.output_prefix, self.output_prefix
-                    )
+        # Note, the execution of tleap is assumed to take place in the
+        # same directory as all the associated input files, so we won't
+        # put directory paths on the saveamberparm or savepdb commands.
+        if self.output_prefix and self.write_save_lines:
+            lines.append("savepdb {} {}.pdb".format(self.unit, self.output_prefix))
+            lines.append(
+                "saveamberparm {} {}.prmtop {}.rst7".format(
+                    self.unit, self.output_prefix, self.output_prefix
                 )
-            else:
-                pass
-            f.write("desc {}\n".format(self.unit))
-            f.write("quit\n")
+            )
+        lines.append("desc {}".format(self.unit))
+        lines.append("quit")
+
+        f.write(self._template_input + "\n".join(lines) + "\n")
 
-    def run(self):
+    def run(self, script=None, capture_output=True):
         """
         Execute `tleap`.
 
+        Parameters
+        ----------
+        script : str, optional
+            The `tleap` commands to pipe to `tleap` on stdin. If None (or there is no /dev/stdin), the input file
+            written by write_input() is read instead.
+        capture_output : bool
+            Whether to collect the `tleap` output. If False, it is discarded and an empty list is returned.
+
         Returns
         -------
         output : list
@@ -273,33 +358,74 @@ class System(object):
 
         self.check_for_leap_log()
         file_name = self.output_prefix + ".tleap.in"
+        if script is not None and not os.path.exists("/dev/stdin"):
+            self.write_input()
+            script = None
 
-        output = sp.Popen(
-            ["tleap", "-s ", "-f ", file_name],
-            stdout=sp.PIPE,
-            stderr=sp.PIPE,
-            cwd=self.output_path,
-        )
-        output = output.stdout.read().decode().splitlines()
+        output = self._execute(file_name, script, capture_output)
 
         self.grep_leap_log()
         return output
 
-    def grep_leap_log(self):
+    def _execute(self, file_name, script=None, capture_output=True):
+        """
+        Run `tleap` in output_path without touching `leap.log`.
+
+        Parameters
+        ----------
+        file_name : str
+            The input file to read, if script is None
+        script : str, optional
+            The `tleap` commands to pipe on stdin instead
+        capture_output : bool
+            Whether to collect the `tleap` output. If False, it is sent to /dev/null.
+
+        Returns
+        -------
+        output : list
+            The tleap stdout returned as a list.
+
+        """
+        if System._TLEAP_BIN is None:
+            System._TLEAP_BIN = shutil.which("tleap") or "tleap"
+
+        if script is not None:
+            file_name = "/dev/stdin"
+
+        stream = sp.PIPE if capture_output else sp.DEVNULL
+        result = sp.run(
+            [System._TLEAP_BIN, "-s", "-f", file_name],
+            input=script,
+            stdout=stream,
+            stderr=stream,
+            universal_newlines=True,
+            cwd=self.output_path,
+        )
+        if not capture_output:
+            return []
+        return result.stdout.splitlines()
+
+    def grep_leap_log(self, log_file="leap.log"):
         """
         Check for a few keywords in the `tleap` output.
 
+        Parameters
+        ----------
+        log_file : str
+            Name of the tleap logfile. Default: leap.log
+
         """
         try:
-            with open(self.output_path + "leap.log", "r") as file:
-                for line in file.readlines():
-                    if re.search(
-                        "ERROR|WARNING|Warning|duplicate|FATAL|Could|Fatal|Error", line
-                    ):
+            with open(os.path.join(self.output_path, log_file), "rb") as file:
+                # An empty file cannot be mapped, but there is nothing to check either.
+                if os.fstat(file.fileno()).st_size == 0:
+                    return
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as contents:
+                    if _LEAP_LOG_PROBLEM_RE.search(contents):
                         log.warning(
-                            "It appears there was a problem with solvation: check `leap.log`..."
+                            "It appears there was a problem with solvation: check `{}`...".format(log_file)
                         )
-        except BaseException:
+        except FileNotFoundError:
             return
 
     def check_for_leap_log(self, log_file="leap.log"):
@@ -330,11 +456,14 @@ class System(object):
         # the solvate() algorithm is focused on getting target_waters correct.
         if self.target_waters is None:
             self.target_waters = self.count_waters()
+            probe = False
         # If target_waters is set, we assume that overrides buffer_value. We'll
         # set buffer_value = 1.0 because that seems to lead to smooth convergence
         # of the solvate() routine.
         else:
             self.buffer_value = 1.0
+            # The probes pipe their commands to tleap, so they need /dev/stdin.
+            probe = self.probe_workers > 1 and os.path.exists("/dev/stdin")
 
         # If the user has not set manual_switch_thresh, we will set it proportionately
         # to the target_waters. This will control when we can start manually deleting
@@ -356,6 +485,18 @@ class System(object):
         # pdbs
         self.write_save_lines = False
 
+        # Try several doubling buffer values at once to bracket the target, then start the search from the smallest
+        # one that adds enough waters. The other probes are kept as samples for adjust_buffer_value().
+        if probe:
+            buffers = [self.buffer_value * 2 ** i for i in range(self.probe_workers)]
+            waters = self._probe_buffers(buffers)
+            enough = [i for i, water in enumerate(waters) if water >= self.target_waters]
+            start = enough[0] if enough else len(buffers) - 1
+            for i, (buffer_value, water) in enumerate(zip(buffers, waters)):
+                if i != start:
+                    self._probe_samples.append((buffer_value, water))
+            self.buffer_value = buffers[start]
+
         # First, a coarse adjustment...
         # This will run for 50 iterations or until we (a) have more waters than the target and (b) are within ~12 waters
         # of the target (that can be manually removed).
@@ -369,13 +510,17 @@ class System(object):
             self.wat_added_history.append(waters)
             self.buffer_val_history.append(self.buffer_value)
             log.debug(
-                "Cycle {:02.0f} {:.0f} {:10.7f} {:6.0f} ({:6.0f})".format(
-                    cycle, self.exponent, self.buffer_value, waters, self.target_waters
+                "Cycle {:02.0f} {:10.7f} {:6.0f} ({:6.0f})".format(
+                    cycle, self.buffer_value, waters, self.target_waters
                 )
             )
 
-            # Possible location of a switch to adjust the buffer_value by polynomial
-            # fit approach.
+            # Before saving, base any molar ion counts on the volume at this buffer value rather than an estimate. If
+            # that changes the ions, the waters have to be counted again.
+            close = 0 <= waters - self.target_waters < self.manual_switch_thresh
+            if close and self._remeasure_molar_ions():
+                cycle += 1
+                continue
 
             # If we've nailed it, break!
             if waters == self.target_waters:
@@ -387,17 +532,17 @@ class System(object):
                 waters > self.target_waters
                 and (waters - self.target_waters) < self.manual_switch_thresh
             ):
+                # The run that reaches the target also saves the files
                 self.remove_waters_manually()
-                # Run once more and save files
-                self.final_solvation_run()
                 return
             # Otherwise, try to keep adjusting the number of waters...
             else:
-                self.adjust_buffer_value()
                 # Now that we're close, let's re-evaluate how many ions to add, in case the volume has changed a lot.
-                # (This could be slow and run less frequently...)
+                # (This could be slow and run less frequently...) This comes before the adjustment, so any probe it
+                # runs already uses the new ions and its cached output is still valid for the next count.
                 if self.add_ions and cycle % 10 == 0:
                     self.set_additional_ions()
+                self.adjust_buffer_value()
                 cycle += 1
 
         if cycle >= self.max_cycles and waters > self.target_waters:
@@ -406,8 +551,13 @@ class System(object):
                     waters, self.target_waters, self.max_cycles
                 )
             )
+            # The last adjustment moved buffer_value on without counting it; go back to the run that was counted.
+            self.buffer_value = self.buffer_val_history[-1]
+            if self._remeasure_molar_ions():
+                self.wat_added_history.append(self.count_waters())
+                self.buffer_val_history.append(self.buffer_value)
             self.remove_waters_manually()
-            self.final_solvation_run()
+            return
 
         if cycle >= self.max_cycles and waters < self.target_waters:
             raise Exception(
@@ -468,23 +618,7 @@ class System(object):
 
         """
         for attempt in range(10):
-            self.write_input()
-            output = self.run()
-            # Return a dictionary of {'RES' : number of RES}
-            residues = {}
-            for line in output:
-                # Is this line a residue from `desc` command?
-                match = re.search("^R<(.*) ", line)
-                if match:
-                    residue_name = match.group(1)
-                    # If this residue is not in the dictionary, initialize and
-                    # set the count to 1.
-                    if residue_name not in residues:
-                        residues[residue_name] = 1
-                    # If this residue is in the dictionary, increment the count
-                    # each time we find an instance.
-                    elif residue_name in residues:
-                        residues[residue_name] += 1
+            residues = self._run_and_parse()["residues"]
             if residues:
                 break
             if attempt == 9:
@@ -521,7 +655,8 @@ class System(object):
                 "each ion to be added (or molarity ending in 'M' or molality ending in 'm')."
             )
         self.add_ion_residues = []
-        for ion, amount in zip(self.add_ions[0::2], self.add_ions[1::2]):
+        pairs = iter(self.add_ions)
+        for ion, amount in zip(pairs, pairs):
             self.add_ion_residues.append(ion)
             if isinstance(amount, int):
                 self.add_ion_residues.append(amount)
@@ -529,29 +664,92 @@ class System(object):
                 # User specifies molality...
                 # number to add = (molality) x (number waters) x (kg/mol
                 # solvent)
-                number_to_add = int(
-                    np.ceil(
-                        float(amount[:-1])
-                        * self.target_waters
-                        * self.kg_per_mol_solvent
-                    )
+                number_to_add = math.ceil(
+                    float(amount[:-1]) * self.target_waters * self.kg_per_mol_solvent
                 )
                 self.add_ion_residues.append(number_to_add)
             elif isinstance(amount, str) and amount[-1] == "M":
                 # User specifies molarity...
-                volume = self.get_volume()
+                volume = self._estimate_volume()
                 if volume is None:
                     raise Exception(
                         "The volume of the system could not be found and thus "
                         "the correct ion count could not be determined."
                     )
-                number_of_atoms = float(amount[:-1]) * N_A
-                liters = volume * ANGSTROM_CUBED_TO_LITERS
-                number_to_add = int(np.ceil(number_of_atoms * liters))
+                number_to_add = math.ceil(
+                    float(amount[:-1]) * volume * MOLAR_TO_COUNT_PER_A3
+                )
                 self.add_ion_residues.append(number_to_add)
             else:
                 raise Exception("Unanticipated error calculating how many ions to add.")
 
+    def _estimate_volume(self):
+        """
+        Return the volume of the structure at the current buffer value, only running `tleap` until it can be
+        estimated.
+
+        Once volumes have been measured at two different buffer values, the volume at any other buffer value is
+        extrapolated from a linear fit. For cubic and octahedral boxes every edge grows linearly with the buffer
+        value, so the fit is to the cube root of the volume; a rectangular box only grows along z, so the volume
+        itself is fit. A volume already measured at the current buffer value is returned as is.
+
+        Returns
+        -------
+        volume : float
+            The (estimated) volume of the structure in cubic angstroms
+
+        """
+        for buffer_value, volume in self._volume_samples:
+            if buffer_value == self.buffer_value:
+                return volume
+
+        buffers = [buffer_value for buffer_value, volume in self._volume_samples]
+        if len(set(buffers)) < 2:
+            return self._measure_volume()
+
+        volumes = np.array([volume for buffer_value, volume in self._volume_samples])
+        if self.pbc_type == "rectangular":
+            slope, intercept = np.polyfit(buffers, volumes, 1)
+            return slope * self.buffer_value + intercept
+        slope, intercept = np.polyfit(buffers, np.cbrt(volumes), 1)
+        return (slope * self.buffer_value + intercept) ** 3
+
+    def _measure_volume(self):
+        """
+        Run `tleap` for the volume at the current buffer value and keep it as a sample for _estimate_volume().
+
+        Returns
+        -------
+        volume : float
+            The volume of the structure in cubic angstroms, or None if `tleap` did not report it
+
+        """
+        volume = self.get_volume()
+        if volume is not None:
+            self._volume_samples.append((self.buffer_value, volume))
+        return volume
+
+    def _remeasure_molar_ions(self):
+        """
+        Recompute the number of ions given as a molarity from the volume measured at the current buffer value,
+        rather than an extrapolated one. Called before the files are saved.
+
+        Returns
+        -------
+        changed : bool
+            Whether any ion count changed, in which case the waters need to be counted again
+
+        """
+        if not self.add_ions or not any(
+            isinstance(amount, str) and amount[-1] == "M" for amount in self.add_ions[1::2]
+        ):
+            return False
+        if all(buffer_value != self.buffer_value for buffer_value, volume in self._volume_samples):
+            self._measure_volume()
+        previous = self.add_ion_residues
+        self.set_additional_ions()
+        return self.add_ion_residues != previous
+
     def get_volume(self):
         """
         Run and parse `tleap` output and return the volume of the structure.
@@ -562,21 +760,18 @@ class System(object):
             The volume of the structure in cubic angstroms
 
         """
-        output = self.run()
-        # Return the total simulation volume
-        for line in output:
-            line = line.strip()
-            if "Volume" in line:
-                match = re.search("Volume(.*)", line)
-                volume = float(match.group(1)[1:-4])
-                return volume
-        log.warning("Could not determine total simulation volume.")
-        return None
+        volume = self._run_and_parse()["volume"]
+        if volume is None:
+            log.warning("Could not determine total simulation volume.")
+        return volume
 
     def remove_waters_manually(self):
         """
         Remove a few water molecules manually with `tleap` to exactly match a desired number of waters.
 
+        Each attempt is run with write_save_lines = True, so the attempt that hits the target has already written the
+        final files and no separate final_solvation_run() is needed.
+
         """
 
         cycle = 0
@@ -585,6 +780,7 @@ class System(object):
         while waters > self.target_waters:
             # Retrieve excess water residues
             water_surplus = waters - self.target_waters
+            self.write_save_lines = False
             water_residues = self.list_waters()
 
             # THIS IS HACKY. But if we've gone > 5 cycles, we're probably
@@ -603,8 +799,9 @@ class System(object):
             self.waters_to_remove = water_residues[-1 * water_surplus :]
             log.debug("Manually removing waters... {}".format(self.waters_to_remove))
 
-            # Get counts for all residues
-            residues = self.count_residues()
+            # Get counts for all residues, saving the files in case this is the final run
+            self.write_save_lines = True
+            residues = self.count_residues(print_results=True)
 
             # Check if we reached target
             waters = residues["WAT"]
@@ -616,6 +813,9 @@ class System(object):
                     "Solvation failed due to an unanticipated problem with water removal."
                 )
 
+        # We removed too many waters; see if a repeat of the last run lands on the target.
+        self.final_solvation_run()
+
     def list_waters(self):
         """
         Run and parse `tleap` output and return the a list of water residues.
@@ -626,101 +826,203 @@ class System(object):
             A list of the water residues in the structure
 
         """
-        output = self.run()
+        return self._run_and_parse()["waters"]
+
+    def _run_and_parse(self):
+        """
+        Write and run the `tleap` input, then parse the residue counts, water residue numbers, and volume from the
+        output in one pass.
 
-        # Return a list of residue numbers for the waters
-        water_residues = []
-        for line in output:
-            # Is this line a water?
-            match = re.search("^R<WAT (.*)>", line)
-            if match:
-                water_residues.append(match.group(1))
-        return water_residues
+        The parsed output is cached by the settings that affect it, so asking for the residues, waters, and volume
+        of the same system only runs `tleap` once. Runs with `write_save_lines` set always execute, so that the files
+        are written, but their output still fills the cache.
+
+        Returns
+        -------
+        parsed : dict
+            The residue counts under "residues", the list of water residues under "waters", and the volume in cubic
+            angstroms (or None) under "volume"
+
+        """
+        key = self._run_key()
+        if not self.write_save_lines and key in self._run_cache:
+            return self._run_cache[key]
+
+        # Only write an input file when it goes with saved output files; otherwise pipe the commands to tleap.
+        if self.write_save_lines:
+            self.write_input()
+            output = self.run()
+        else:
+            commands = io.StringIO()
+            self._write_commands(commands)
+            output = self.run(script=commands.getvalue())
+
+        parsed = _parse_output(output)
+        # Only cache successful runs.
+        if parsed["residues"]:
+            self._run_cache[key] = parsed
+        return parsed
+
+    def _run_key(self):
+        """
+        The settings that determine the `tleap` output, used as the key for cached runs.
+
+        """
+        return (
+            self._template_input,
+            self.unit,
+            self.pbc_type,
+            self.water_box,
+            self.buffer_value,
+            self.neutralize,
+            self.counter_cation,
+            self.counter_anion,
+            tuple(self.add_ion_residues or ()),
+            tuple(self.waters_to_remove or ()),
+        )
+
+    def _probe_buffers(self, buffer_values):
+        """
+        Count the waters added at several buffer values, running `tleap` for each of them at the same time.
+
+        The probes run in output_path, so the files loaded by the template are found as usual, but each one logs to
+        its own `<output_prefix>.probe<N>.log` instead of `leap.log`, which is checked after it finishes. Their output
+        is added to the run cache, so revisiting any of these buffer values later does not run `tleap` again.
+
+        Parameters
+        ----------
+        buffer_values : list
+            The buffer values to try
+
+        Returns
+        -------
+        waters : list
+            The number of waters added at each buffer value
+
+        """
+
+        def probe(index, buffer_value):
+            system = copy.copy(self)
+            system.buffer_value = buffer_value
+            system.write_save_lines = False
+            key = system._run_key()
+            if key not in self._run_cache:
+                log_file = "{}.probe{}.log".format(self.output_prefix, index)
+                system.check_for_leap_log(log_file)
+                commands = io.StringIO()
+                commands.write("logFile {}\n".format(log_file))
+                system._write_commands(commands)
+                parsed = _parse_output(system._execute(None, commands.getvalue()))
+                system.grep_leap_log(log_file)
+                if not parsed["residues"]:
+                    raise Exception(
+                        "tleap did not report any residues with buffer_value = {}".format(
+                            buffer_value
+                        )
+                    )
+                self._run_cache[key] = parsed
+            return self._run_cache[key]["residues"]["WAT"]
+
+        with ThreadPoolExecutor(max_workers=len(buffer_values)) as executor:
+            waters = list(executor.map(probe, range(len(buffer_values)), buffer_values))
+        return waters
 
     def adjust_buffer_value(self):
         """
-        Determine whether to increase or decrease the buffer thickness to match a desired number of waters.
+        Choose the next buffer thickness to try in order to match a desired number of waters.
+
+        The number of waters grows monotonically (roughly cubically) with the buffer value, so this is a root search.
+        Until the target is bracketed, the buffer value is doubled or halved. Once it is bracketed, the next guess
+        comes from a cubic fit to the history (with at least four distinct buffer values) or linear interpolation across the bracket,
+        falling back to bisection when the guess would barely shrink the bracket.
+
+        With probe_workers > 1, a second buffer value is counted alongside the guess once the target is bracketed, so
+        the next cycle starts from a tighter bracket whichever side of the guess the target is on.
 
         Sets
         -------
         self.buffer_value : float
             A new buffer size to try
-        self.exponent : int
-            Adjusts the order of magnitue of buffer value changes
-        self.cyc_since_last_exp_change : int
-            Resets this value to 0 when exponent value is changed to help with the logic gates.
 
         """
 
-        # If the number of waters was less than the target and is now greater than the target, make the buffer smaller
-        # smaller
-        if (
-            self.wat_added_history[-2] < self.target_waters
-            and self.wat_added_history[-1] > self.target_waters
-        ):
-            # If its been more than one round since last exponent change,
-            # change exponent
-            if self.cyc_since_last_exp_change > 1:
-                log.debug("Adjustment loop 1a")
-                self.exponent -= 1
-                self.buffer_value = self.buffer_val_history[-1] + -5 * (
-                    10 ** self.exponent
-                )
-                self.cyc_since_last_exp_change = 0
-            else:
-                log.debug("Adjustment loop 1b")
-                self.buffer_value = self.buffer_val_history[-1] + -1 * (
-                    10 ** self.exponent
-                )
-                self.cyc_since_last_exp_change += 1
-        # If the number of waters was greater than the target and is now less
-        # than the target, make the buffer bigger
-        elif (
-            self.wat_added_history[-2] > self.target_waters
-            and self.wat_added_history[-1] < self.target_waters
-        ):
-            # If its been more than one round since last exponent change,
-            # change exponent
-            if self.cyc_since_last_exp_change > 1:
-                log.debug("Adjustment loop 2a")
-                self.exponent -= 1
-                self.buffer_value = self.buffer_val_history[-1] + 5 * (
-                    10 ** self.exponent
-                )
-                self.cyc_since_last_exp_change = 0
-            else:
-                log.debug("Adjustment loop 2b")
-                self.buffer_value = self.buffer_val_history[-1] + 1 * (
-                    10 ** self.exponent
-                )
-                self.cyc_since_last_exp_change += 1
-        # If the last two rounds of solvation have too many waters, make the
-        # buffer smaller...
-        elif (
-            self.wat_added_history[-2] > self.target_waters
-            and self.wat_added_history[-1] > self.target_waters
-        ):
-            log.debug("Adjustment loop 3")
-            self.buffer_value = self.buffer_val_history[-1] + -1 * (10 ** self.exponent)
-            self.cyc_since_last_exp_change += 1
-        # If the last two rounds of solvation had too few waters, make the
-        # buffer bigger...
-        elif (
-            self.wat_added_history[-2] < self.target_waters
-            and self.wat_added_history[-1] < self.target_waters
-        ):
-            log.debug("Adjustment loop 4")
-            self.buffer_value = self.buffer_val_history[-1] + 1 * (10 ** self.exponent)
-            self.cyc_since_last_exp_change += 1
+        # Skip the initial [0] placeholders in the history.
+        buffers = np.asarray(
+            self.buffer_val_history[1:] + [buffer_value for buffer_value, count in self._probe_samples], dtype=float
+        )
+        waters = np.asarray(
+            self.wat_added_history[1:] + [count for buffer_value, count in self._probe_samples], dtype=float
+        )
+        below = waters < self.target_waters
+        above = waters > self.target_waters
+
+        if not above.any():
+            log.debug("Adjustment: expanding the buffer until there are too many waters")
+            self.buffer_value = 2.0 * buffers[below].max()
+            return
+        if not below.any():
+            log.debug("Adjustment: shrinking the buffer until there are too few waters")
+            self.buffer_value = 0.5 * buffers[above].min()
+            return
+
+        low = buffers[below].max()
+        high = buffers[above].min()
+        low_waters = waters[buffers == low][-1]
+        high_waters = waters[buffers == high][-1]
+        width = high - low
+
+        guess = low + (self.target_waters - low_waters) * width / (high_waters - low_waters)
+        # Repeated counts at one buffer value (e.g. after the ions changed) do not help determine the fit.
+        if len(np.unique(buffers)) >= 4:
+            roots = np.roots(np.polyfit(buffers, waters, 3) - np.array([0, 0, 0, self.target_waters]))
+            roots = roots[np.isreal(roots)].real
+            roots = roots[(roots > low) & (roots < high)]
+            if len(roots) > 0:
+                guess = roots[0]
+
+        if low + 0.1 * width < guess < high - 0.1 * width:
+            log.debug("Adjustment: interpolating between {:.7f} and {:.7f}".format(low, high))
+            self.buffer_value = guess
         else:
-            raise Exception(
-                "The buffer_values search died due to an unanticipated set of variable values"
-            )
+            log.debug("Adjustment: bisecting between {:.7f} and {:.7f}".format(low, high))
+            self.buffer_value = low + 0.5 * width
 
-        if self.exponent <= self.min_exponent_limit:
-            raise Exception(
-                "Automatic adjustment of the buffer value failed to get near enough to target_waters "
-                "before the exponent value was below {:.0f}. Try increasing manual_switch_thresh.".format(
-                    self.exponent
-                )
-            )
+        if self.probe_workers > 1 and os.path.exists("/dev/stdin"):
+            self._probe_alongside(low, high)
+
+    def _probe_alongside(self, low, high):
+        """
+        Count waters at the current buffer value and, at the same time, at the middle of the wider side of the
+        bracket it splits. The current buffer value's output is cached for the search loop to pick up, and the extra
+        sample is kept apart from the history, which only records buffer values the search loop counted itself. If
+        the extra sample is the better place to continue from (it hits the target, or lands close enough above it to
+        remove waters by hand), the two are swapped.
+
+        Parameters
+        ----------
+        low : float
+            The largest buffer value known to add too few waters
+        high : float
+            The smallest buffer value known to add too many waters
+
+        """
+        guess = self.buffer_value
+        if guess - low > high - guess:
+            other = 0.5 * (low + guess)
+        else:
+            other = 0.5 * (guess + high)
+        guess_waters, other_waters = self._probe_buffers([guess, other])
+
+        def rank(waters):
+            # An exact hit beats one we can fix by removing waters, which beats anything else.
+            if waters == self.target_waters:
+                return 0
+            if 0 < waters - self.target_waters < self.manual_switch_thresh:
+                return 1
+            return 2
+
+        if rank(other_waters) < rank(guess_waters):
+            guess, other = other, guess
+            other_waters = guess_waters
+        self.buffer_value = guess
+        self._probe_samples.append((other, other_waters))
@@ -1,8 +1,11 @@
+import copy
+import importlib.util
 import logging
 import os as os
 import shutil
+import weakref
+from collections import OrderedDict
 from datetime import datetime
-from functools import lru_cache
 
 import parmed as pmd
 import pytraj as pt
@@ -10,11 +13,78 @@ from parmed.structure import Structure as ParmedStructureClass
 
 logger = logging.getLogger(__name__)
 
+# Atom indices selected by each mask, keyed by (mask, amber_index) for every structure that has been queried. The
+# structures are held weakly, so the cache does not keep them alive. Structures given as file names use the cached
+# structure parsed from that file.
+_MASK_INDICES = weakref.WeakKeyDictionary()
+
+# Whether OpenMM is installed; probed on the first call to has_openmm().
+_HAS_OPENMM = None
+
+# The most recently parsed structures by absolute path, along with the modification time of the file when it was
+# parsed. Only the last few files are kept, so a long run does not hold on to every structure it has read.
+_STRUCTURES = OrderedDict()
+_STRUCTURES_SIZE = 8
+
+# File types whose `parmed` parser accepts `skip_bonds`.
+_SKIP_BONDS_EXTENSIONS = (".pdb", ".ent", ".cif", ".pdbx")
+
+
+def has_openmm():
+    """
+    Return whether OpenMM is installed, without importing it.
+
+    Returns
+    -------
+    has_openmm : bool
+
+    """
+    global _HAS_OPENMM
+    if _HAS_OPENMM is None:
+        try:
+            _HAS_OPENMM = importlib.util.find_spec("simtk.openmm") is not None
+        except ImportError:
+            # `simtk` itself is missing.
+            _HAS_OPENMM = False
+    return _HAS_OPENMM
+
+
+def _load_structure(filename, skip_bonds=False):
+    """
+    Return the cached structure parsed from a file, parsing it again if the file has changed on disk since.
+
+    If ``skip_bonds`` is true, bond assignment is skipped for PDB and PDBx/mmCIF files; other file types are always
+    loaded in full. A structure loaded with bonds is reused for callers that do not need them, but not the other way
+    around. The returned structure is shared with other callers and must not be modified.
+    """
+    path = os.path.abspath(filename)
+    mtime = os.path.getmtime(path)
+    name = path.lower()
+    if name.endswith((".gz", ".bz2")):
+        name = os.path.splitext(name)[0]
+    skip_bonds = skip_bonds and name.endswith(_SKIP_BONDS_EXTENSIONS)
+    entry = _STRUCTURES.get(path)
+    if entry is None or entry[0] != mtime or (entry[1] and not skip_bonds):
+        if skip_bonds:
+            structure = pmd.load_file(path, skip_bonds=True)
+        else:
+            structure = pmd.load_file(path)
+        entry = (mtime, skip_bonds, structure)
+        logger.info("Loaded {}...".format(filename))
+        _STRUCTURES[path] = entry
+    _STRUCTURES.move_to_end(path)
+    while len(_STRUCTURES) > _STRUCTURES_SIZE:
+        _STRUCTURES.popitem(last=False)
+    return entry[2]
+
 
 def return_parmed_structure(filename):
     """
     Return a structure object from a filename.
 
+    Each file is only parsed once while it is unchanged on disk; later calls return a copy of the parsed structure, so
+    callers are free to modify it.
+
     Parameters
     ----------
     filename : str
@@ -28,17 +98,26 @@ def return_parmed_structure(filename):
     # `parmed` can read both PDBs and
     # .inpcrd/.prmtop files with the same function call.
     try:
-        structure = pmd.load_file(filename)
-        logger.info("Loaded {}...".format(filename))
+        structure = copy.copy(_load_structure(filename))
     except IOError:
         logger.error("Unable to load file: {}".format(filename))
     return structure
 
-@lru_cache(maxsize=32)
+
+def _cached_indices(structure):
+    """
+    Return the dictionary of cached mask indices for a structure, creating it if needed.
+    """
+    return _MASK_INDICES.setdefault(structure, {})
+
+
 def index_from_mask(structure, mask, amber_index=False):
     """
     Return the atom indicies for a given selection mask.
 
+    This is :func:`index_from_masks` for a single mask, so the result is cached for each structure object, and a mask
+    that is ``None`` (or empty) gives ``None``.
+
     Parameters
     ----------
     structure : `class`:`parmed.structure.Structure`
@@ -53,26 +132,58 @@ def index_from_mask(structure, mask, amber_index=False):
     indices : int
         Atom index or indices corresponding to the mask
 
+    """
+    return index_from_masks(structure, (mask,), amber_index)[0]
+
+
+def index_from_masks(structure, masks, amber_index=False):
+    """
+    Return the atom indices for several selection masks, collecting them in a single pass over the atoms.
+
+    Like :func:`index_from_mask`, the indices are cached for each structure.
+
+    Parameters
+    ----------
+    structure : `class`:`parmed.structure.Structure`
+        The structure that contains the atoms
+    masks : tuple
+        The atom masks. Masks that are ``None`` (or empty) are skipped.
+    amber_index : bool
+        If true, 1 will be added to the returned indices
+
+    Returns
+    -------
+    indices : tuple
+        A list of atom indices for each mask, or ``None`` for each skipped mask
+
     """
     if amber_index:
         index_offset = 1
     else:
         index_offset = 0
-    if isinstance(structure, str):
-        structure = return_parmed_structure(structure)
-    elif isinstance(structure, ParmedStructureClass):
-        pass
-    else:
+    if not isinstance(structure, (str, ParmedStructureClass)):
         raise Exception(
-            "index_from_mask does not support the type associated with structure:"
-            + type(structure)
+            "index_from_masks does not support the type associated with structure:"
+            + str(type(structure))
         )
-    # http://parmed.github.io/ParmEd/html/api/parmed/parmed.amber.mask.html?highlight=mask#module-parmed.amber.mask
-    indices = [
-        i + index_offset for i in pmd.amber.mask.AmberMask(structure, mask).Selected()
-    ]
-    logger.debug("There are {} atoms in the mask {}  ...".format(len(indices), mask))
-    return indices
+    if isinstance(structure, str):
+        # Masks do not depend on bonds.
+        structure = _load_structure(structure, skip_bonds=True)
+    cache = _cached_indices(structure)
+    active = [i for i, mask in enumerate(masks) if mask]
+    missing = [i for i in active if (masks[i], amber_index) not in cache]
+    selections = [pmd.amber.mask.AmberMask(structure, masks[i]).Selection() for i in missing]
+    selected_indices = {i: [] for i in missing}
+    for atom_index, selected in enumerate(zip(*selections)):
+        for i, flag in zip(missing, selected):
+            if flag:
+                selected_indices[i].append(atom_index + index_offset)
+    for i in missing:
+        cache[(masks[i], amber_index)] = selected_indices[i]
+    indices = [list(cache[(mask, amber_index)]) if i in active else None for i, mask in enumerate(masks)]
+    for i in active:
+        logger.debug("There are {} atoms in the mask {}  ...".format(len(indices[i]), masks[i]))
+    return tuple(indices)
 
 
 def make_window_dirs(
@@ -106,9 +217,7 @@ def make_window_dirs(
         shutil.move(win_dir, stash_dir)
 
     for window in window_list:
-        window_path = os.path.join(win_dir, window)
-        if not os.path.exists(window_path):
-            os.makedirs(window_path)
+        os.makedirs(os.path.join(win_dir, window), exist_ok=True)
 
 
 def strip_prmtop(prmtop, mask=":WAT,:Na+,:Cl-"):